@@ -1,90 +1,424 @@
 # backend/app/ai.py
 import os
 import json
-from openai import OpenAI
+import time
+import random
+import asyncio
+
+import httpx
+import openai
+from openai import AsyncOpenAI
 from dotenv import load_dotenv
 
+from .cache import response_cache, cache_key
+from .streaming import IncrementalRubricParser
+from .rubric_index import get_rubric_index, annotate_rubrics, annotate_rubric
+from . import metrics
+
 load_dotenv()
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
 
-def call_openai_parse(text: str):
-    try:
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are a clinical analysis assistant. "
-                        "Extract key symptoms, generate medical rubrics, "
-                        "assess risk level, and return ONLY valid JSON with fields: "
-                        "summary, rubrics (array), risk."
-                    )
-                },
-                {
-                    "role": "user",
-                    "content": text
-                }
-            ],
-            temperature=0.0,
-            max_tokens=400,
+LLM_MODEL = os.environ.get("LLM_MODEL", "gpt-4o-mini")
+# point at bench/stub_llm.py (e.g. http://127.0.0.1:9000/v1) to run offline
+LLM_BASE_URL = os.environ.get("OPENAI_BASE_URL") or None
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", "30"))
+LLM_CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", "5"))
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", "64"))
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "16"))
+LLM_MAX_QUEUE = int(os.environ.get("LLM_MAX_QUEUE", "128"))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "2"))
+LLM_BACKOFF_BASE = float(os.environ.get("LLM_BACKOFF_BASE", "0.25"))
+LLM_BACKOFF_MAX = float(os.environ.get("LLM_BACKOFF_MAX", "4"))
+
+PARSE_SYSTEM_PROMPT = (
+    "You are a medical analysis assistant.\n"
+    "Return ONLY valid JSON with this exact structure:\n"
+    "{\n"
+    "  \"summary\": string,\n"
+    "  \"risk\": \"low\" | \"medium\" | \"high\",\n"
+    "  \"rubrics\": [\n"
+    "    {\n"
+    "      \"path\": string,\n"
+    "      \"confidence\": number,\n"
+    "      \"evidence\": string\n"
+    "    }\n"
+    "  ]\n"
+    "}\n"
+    "Do not return arrays of strings."
+)
+
+PACKED_SYSTEM_PROMPT = (
+    "You are a medical analysis assistant.\n"
+    "You will receive several independent cases, each starting with its index "
+    "in square brackets, e.g. [0].\n"
+    "Analyse each case separately and return ONLY valid JSON with this exact structure:\n"
+    "{\n"
+    "  \"results\": [\n"
+    "    {\n"
+    "      \"index\": number,\n"
+    "      \"summary\": string,\n"
+    "      \"risk\": \"low\" | \"medium\" | \"high\",\n"
+    "      \"rubrics\": [\n"
+    "        {\"path\": string, \"confidence\": number, \"evidence\": string}\n"
+    "      ]\n"
+    "    }\n"
+    "  ]\n"
+    "}\n"
+    "Return exactly one result per case and do not return arrays of strings."
+)
+
+# errors worth another attempt; anything else (bad request, auth) fails fast
+RETRYABLE_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+class LLMBusyError(Exception):
+    """Raised when the LLM wait queue is full; callers should answer 429."""
+
+
+def parse_cache_key(text: str) -> str:
+    # also stored on cases (cases.parse_key) to tell whether a stored parse is current
+    return cache_key(text, LLM_MODEL, PARSE_SYSTEM_PROMPT, 0.1)
+
+
+def packed_cache_key(text: str) -> str:
+    # a packed answer comes from a different prompt, so it gets its own key:
+    # batches reuse it, single parses and cases.parse_key never see it
+    return cache_key(text, LLM_MODEL, PACKED_SYSTEM_PROMPT, 0.1)
+
+
+def fallback_rubrics(text: str | None = None):
+    # with a repertory loaded, match the case text locally instead of guessing
+    index = get_rubric_index()
+    metrics.llm_fallbacks.inc("index" if index is not None and text else "static")
+    if index is not None and text:
+        rubrics = index.extract(text)
+        if rubrics:
+            return rubrics
+    return [
+        {
+            "path": "Head > Pain > Night",
+            "confidence": 0.6,
+            "evidence": "local fallback",
+        }
+    ]
+
+
+def fallback_parse(text: str | None = None):
+    return {
+        "summary": "AI unavailable",
+        "risk": "unknown",
+        "rubrics": fallback_rubrics(text),
+    }
+
+
+# ---------------------------------------------------------------------------
+# async layer: one pooled client per worker, bounded concurrency, retries
+# ---------------------------------------------------------------------------
+
+_async_client: AsyncOpenAI | None = None
+_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+_waiting = 0
+# batch workers waiting for a slot; not counted against LLM_MAX_QUEUE
+_background_waiting = 0
+
+
+def get_async_client() -> AsyncOpenAI:
+    global _async_client
+    if _async_client is None:
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_CONNECTIONS,
+            ),
+            timeout=httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
         )
+        _async_client = AsyncOpenAI(
+            api_key=os.environ.get("OPENAI_API_KEY"),
+            base_url=LLM_BASE_URL,
+            http_client=http_client,
+            # retries are handled below so they share the concurrency slot
+            max_retries=0,
+        )
+    return _async_client
 
-        content = resp.choices[0].message.content.strip()
-        return json.loads(content)
 
-    except Exception as e:
-        print("OPENAI ERROR:", e)
-        return [
-            {
-                "path": "Head > Pain > Night",
-                "confidence": 0.6,
-                "evidence": "local fallback",
-            }
-        ]
+async def close_async_client():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+
+
+async def ping_llm(timeout: float = 2.0):
+    """Reachability check for readiness probes: fetches the configured
+    model's metadata, which spends no tokens. Raises on failure."""
+    await get_async_client().models.retrieve(LLM_MODEL, timeout=timeout)
+
+
+def llm_queue_depth() -> int:
+    return _waiting + _background_waiting
+
+
+metrics.Gauge("llm_queue_depth", "Requests waiting for an LLM concurrency slot", llm_queue_depth)
+metrics.Gauge(
+    "llm_inflight", "LLM calls currently holding a concurrency slot",
+    lambda: LLM_MAX_CONCURRENCY - _semaphore._value,
+)
 
 
-def parse_text_endpoint(text: str):
+async def _acquire_slot(background: bool = False):
+    """Wait for a concurrency slot. Interactive callers are turned away with
+    LLMBusyError once LLM_MAX_QUEUE of them are waiting; background callers
+    (batch workers, already bounded by BATCH_CONCURRENCY) always wait."""
+    global _waiting, _background_waiting
+    if background:
+        _background_waiting += 1
+        try:
+            await _semaphore.acquire()
+        finally:
+            _background_waiting -= 1
+        return
+    if _semaphore.locked() and _waiting >= LLM_MAX_QUEUE:
+        raise LLMBusyError("LLM queue is full")
+    _waiting += 1
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are a medical analysis assistant.\n"
-                        "Return ONLY valid JSON with this exact structure:\n"
-                        "{\n"
-                        "  \"summary\": string,\n"
-                        "  \"risk\": \"low\" | \"medium\" | \"high\",\n"
-                        "  \"rubrics\": [\n"
-                        "    {\n"
-                        "      \"path\": string,\n"
-                        "      \"confidence\": number,\n"
-                        "      \"evidence\": string\n"
-                        "    }\n"
-                        "  ]\n"
-                        "}\n"
-                        "Do not return arrays of strings."
-                    )
-                },
+        await _semaphore.acquire()
+    finally:
+        _waiting -= 1
+
+
+def _backoff_delay(attempt: int) -> float:
+    # "full jitter": spread retries so a burst of failures doesn't re-synchronise
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+
+
+def _record_usage(usage):
+    if usage is not None:
+        metrics.llm_tokens.inc("prompt", amount=usage.prompt_tokens or 0)
+        metrics.llm_tokens.inc("completion", amount=usage.completion_tokens or 0)
+
+
+async def chat_completion(messages: list, temperature: float, max_tokens: int | None = None,
+                          background: bool = False) -> str:
+    await _acquire_slot(background)
+    try:
+        attempt = 0
+        while True:
+            try:
+                kwargs = {}
+                if max_tokens is not None:
+                    kwargs["max_tokens"] = max_tokens
+                t0 = time.perf_counter()
+                resp = await get_async_client().chat.completions.create(
+                    model=LLM_MODEL,
+                    messages=messages,
+                    temperature=temperature,
+                    **kwargs,
+                )
+                metrics.llm_latency.observe(time.perf_counter() - t0, "completion", "ok")
+                _record_usage(resp.usage)
+                return resp.choices[0].message.content
+            except RETRYABLE_ERRORS:
+                metrics.llm_latency.observe(time.perf_counter() - t0, "completion", "error")
+                if attempt >= LLM_MAX_RETRIES:
+                    raise
+                await asyncio.sleep(_backoff_delay(attempt))
+                attempt += 1
+    finally:
+        _semaphore.release()
+
+
+async def chat_completion_stream(messages: list, temperature: float):
+    """Yield content deltas as they arrive. Retries only happen before the
+    first delta; once text has been handed out a failure is re-raised."""
+    await _acquire_slot()
+    try:
+        attempt = 0
+        while True:
+            started = False
+            t0 = time.perf_counter()
+            try:
+                stream = await get_async_client().chat.completions.create(
+                    model=LLM_MODEL,
+                    messages=messages,
+                    temperature=temperature,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                )
+                async for chunk in stream:
+                    if chunk.usage:
+                        _record_usage(chunk.usage)
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        started = True
+                        yield delta
+                metrics.llm_latency.observe(time.perf_counter() - t0, "stream", "ok")
+                return
+            except RETRYABLE_ERRORS:
+                metrics.llm_latency.observe(time.perf_counter() - t0, "stream", "error")
+                if started or attempt >= LLM_MAX_RETRIES:
+                    raise
+                await asyncio.sleep(_backoff_delay(attempt))
+                attempt += 1
+    finally:
+        _semaphore.release()
+
+
+async def parse_text_strict(text: str, background: bool = False):
+    """Like `parse_text_async` but raises instead of falling back, for
+    callers (batch imports) that report per-item errors. `background`
+    waits for an LLM slot instead of raising LLMBusyError."""
+    async def compute():
+        content = await chat_completion(
+            [
+                {"role": "system", "content": PARSE_SYSTEM_PROMPT},
                 {"role": "user", "content": text}
             ],
-            temperature=0.1
+            temperature=0.1,
+            background=background,
         )
+        return json.loads(content)
 
-        return json.loads(response.choices[0].message.content)
+    metrics.llm_parses.inc()
+    key = parse_cache_key(text)
+    return annotate_rubrics(await response_cache.get_or_compute(key, compute))
 
+
+async def parse_text_async(text: str):
+    try:
+        return await parse_text_strict(text)
+
+    except LLMBusyError:
+        raise
     except Exception as e:
         print("OPENAI ERROR:", e)
-        return {
-            "summary": "AI unavailable",
-            "risk": "unknown",
-            "rubrics": [
-                {
-                    "path": "Head > Pain > Night",
-                    "confidence": 0.6,
-                    "evidence": "local fallback"
-                }
-            ]
-        }
+        return fallback_parse(text)
+
+
+async def cached_parse(text: str):
+    """Cached single or packed parse result for `text` from either cache
+    tier, or None; never calls the model."""
+    for key in (parse_cache_key(text), packed_cache_key(text)):
+        try:
+            result = await response_cache.lookup(key)
+        except Exception:
+            # an in-flight parse of this text failed: the caller retries it
+            result = None
+        if result is not None:
+            return annotate_rubrics(result)
+    return None
+
+
+async def parse_texts_packed(texts: list) -> list:
+    """Parse several short cases in one completion.
+
+    Returns one result per input, or None where the model dropped or
+    garbled that case so the caller can retry it on its own. Results are
+    cached per case under `packed_cache_key`, for `cached_parse`. Only
+    batches pack, so this always waits for an LLM slot.
+    """
+    content = await chat_completion(
+        [
+            {"role": "system", "content": PACKED_SYSTEM_PROMPT},
+            {"role": "user", "content": "\n\n".join("[%d] %s" % (i, t) for i, t in enumerate(texts))}
+        ],
+        temperature=0.1,
+        background=True,
+    )
+    data = json.loads(content)
+    items = data.get("results") if isinstance(data, dict) else data
+
+    out = [None] * len(texts)
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        i = item.pop("index", None)
+        if isinstance(i, int) and 0 <= i < len(texts) and out[i] is None and "rubrics" in item:
+            out[i] = item
+    for text, result in zip(texts, out):
+        if result is not None:
+            await response_cache.store(packed_cache_key(text), result)
+            annotate_rubrics(result)
+    return out
+
+
+def _parse_events(result: dict):
+    for field in ("summary", "risk"):
+        if field in result:
+            yield field, result[field]
+    for rubric in result.get("rubrics") or []:
+        yield "rubric", annotate_rubric(rubric)
+
+
+async def parse_text_stream(text: str):
+    """Async generator of (event, data) pairs for the SSE route.
+
+    Emits summary/risk/rubric events as the completion is parsed, then a
+    final ("done", result). Hits in either cache tier, or an identical parse
+    already in flight, replay the stored result. An upstream failure before
+    any rubric arrived falls back like `parse_text_async`, without
+    repeating fields that were already sent.
+    """
+    metrics.llm_parses.inc()
+    key = parse_cache_key(text)
+    try:
+        cached = await response_cache.lookup(key)
+    except Exception:
+        # the identical parse we waited on failed; try our own
+        cached = None
+    if cached is not None:
+        for event in _parse_events(cached):
+            yield event
+        yield "done", cached
+        return
+
+    claimed = response_cache.claim(key)
+    stored = False
+    parser = IncrementalRubricParser()
+    try:
+        try:
+            async for delta in chat_completion_stream(
+                [
+                    {"role": "system", "content": PARSE_SYSTEM_PROMPT},
+                    {"role": "user", "content": text}
+                ],
+                temperature=0.1,
+            ):
+                for event, data in parser.feed(delta):
+                    if event == "rubric":
+                        annotate_rubric(data)
+                    yield event, data
+
+        except LLMBusyError:
+            raise
+        except Exception as e:
+            print("OPENAI ERROR:", e)
+            result = parser.result()
+            if not parser.data["rubrics"]:
+                fallback = fallback_parse(text)
+                for field in ("summary", "risk"):
+                    if field not in parser.data:
+                        result[field] = fallback[field]
+                        yield field, fallback[field]
+                result["rubrics"] = fallback["rubrics"]
+                for rubric in result["rubrics"]:
+                    yield "rubric", annotate_rubric(rubric)
+            else:
+                yield "error", {"detail": "AI stream interrupted"}
+            yield "done", result
+            return
+
+        result = parser.result()
+        if parser.done:
+            await response_cache.store(key, result)
+            stored = True
+        yield "done", result
+    finally:
+        if claimed and not stored:
+            response_cache.abandon(key)
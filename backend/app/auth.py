@@ -1,7 +1,11 @@
 # backend/app/auth.py
 import os
+import time
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
-from jose import jwt
+from jose import jwt, JWTError
 from datetime import datetime, timedelta
 
 # local imports (relative)
@@ -13,6 +17,33 @@ SECRET_KEY = os.environ.get("SECRET_KEY", "dev-secret")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
+# bcrypt releases the GIL, so a small thread pool gives real parallelism
+# without blocking the event loop; size it to the CPU budget of the worker
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", "4096"))
+# email -> user id for tokens without a uid claim; bounded like the token
+# cache and re-checked after USER_ID_CACHE_TTL seconds
+USER_ID_CACHE_SIZE = int(os.environ.get("USER_ID_CACHE_SIZE", "4096"))
+USER_ID_CACHE_TTL = float(os.environ.get("USER_ID_CACHE_TTL", "300"))
+
+_hash_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_token_cache: OrderedDict[str, dict] = OrderedDict()
+_user_ids: OrderedDict[str, tuple] = OrderedDict()
+
+
+async def hash_password(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_pool, pwd_ctx.hash, password)
+
+
+async def verify_password(password: str, password_hash: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_pool, pwd_ctx.verify, password, password_hash)
+
+
+def shutdown_hash_pool():
+    _hash_pool.shutdown(wait=False, cancel_futures=True)
+
 async def create_user(name: str, email: str, password: str):
     # bcrypt hard limit: 72 bytes
     password = password.encode("utf-8")[:72].decode("utf-8", errors="ignore")
@@ -22,7 +53,7 @@ async def create_user(name: str, email: str, password: str):
     if existing:
         return False
 
-    hashed = pwd_ctx.hash(password)
+    hashed = await hash_password(password)
     insert_q = users.insert().values(
         name=name,
         email=email,
@@ -40,18 +71,71 @@ async def authenticate_user(email: str, password: str):
     if not user:
         return None
 
-    if not pwd_ctx.verify(password, user["password_hash"]):
+    if not await verify_password(password, user["password_hash"]):
         return None
 
-    access_token = create_access_token(user["email"])
+    access_token = create_access_token(user["email"], user_id=user["id"])
     return access_token
 
 
-def create_access_token(subject: str, expires_delta: int | None = None):
+def create_access_token(subject: str, expires_delta: int | None = None, user_id: int | None = None):
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode = {"exp": expire, "sub": subject}
+    if user_id is not None:
+        # lets per-practitioner routes skip a users lookup
+        to_encode["uid"] = user_id
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
+
+
+def decode_access_claims(token: str):
+    """Return the claims of a valid, unexpired JWT, else None.
+
+    Verified tokens are remembered until they expire, so repeat requests
+    skip the signature check entirely; nothing here touches bcrypt or the DB.
+    """
+    now = time.time()
+    claims = _token_cache.get(token)
+    if claims is not None:
+        if claims["exp"] > now:
+            _token_cache.move_to_end(token)
+            return claims
+        del _token_cache[token]
+
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    if not payload.get("sub") or payload.get("exp") is None:
+        return None
+
+    claims = {"sub": payload["sub"], "uid": payload.get("uid"), "exp": float(payload["exp"])}
+    _token_cache[token] = claims
+    if len(_token_cache) > TOKEN_CACHE_SIZE:
+        _token_cache.popitem(last=False)
+    return claims
+
+
+async def user_id_for(claims: dict):
+    """Practitioner id for verified claims; tokens issued before the uid
+    claim existed fall back to one users lookup per email."""
+    if claims.get("uid") is not None:
+        return claims["uid"]
+    email = claims["sub"]
+    now = time.monotonic()
+    cached = _user_ids.get(email)
+    if cached is not None and cached[1] > now:
+        _user_ids.move_to_end(email)
+        return cached[0]
+    row = await database.fetch_one(users.select().where(users.c.email == email))
+    if row is None:
+        _user_ids.pop(email, None)
+        return None
+    _user_ids[email] = (row["id"], now + USER_ID_CACHE_TTL)
+    _user_ids.move_to_end(email)
+    if len(_user_ids) > USER_ID_CACHE_SIZE:
+        _user_ids.popitem(last=False)
+    return row["id"]
@@ -0,0 +1,339 @@
+# backend/app/batch.py
+import os
+import json
+import uuid
+import socket
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import func, or_
+
+from .ai import parse_text_strict, parse_texts_packed, cached_parse, LLMBusyError
+from .cache import normalize_text
+from .database import database
+from .models import parse_jobs, parse_job_items
+
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", "500"))
+JOB_MAX_ITEMS = int(os.environ.get("JOB_MAX_ITEMS", "10000"))
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "8"))
+# cases shorter than this may share one completion when packing is on
+PACK_MAX_CHARS = int(os.environ.get("PACK_MAX_CHARS", "600"))
+PACK_SIZE = int(os.environ.get("PACK_SIZE", "5"))
+BATCH_BUSY_RETRY_DELAY = float(os.environ.get("BATCH_BUSY_RETRY_DELAY", "0.5"))
+# job items per INSERT ... VALUES statement when a job is created
+JOB_INSERT_CHUNK = int(os.environ.get("JOB_INSERT_CHUNK", "1000"))
+# a running job's owner refreshes parse_jobs.heartbeat_at this often; once
+# it is JOB_STALE_AFTER seconds old (crash, deploy) another worker takes over
+JOB_HEARTBEAT_INTERVAL = float(os.environ.get("JOB_HEARTBEAT_INTERVAL", "15"))
+JOB_STALE_AFTER = float(os.environ.get("JOB_STALE_AFTER", "60"))
+
+
+def _error_message(e: Exception) -> str:
+    if isinstance(e, ValueError):
+        return "AI returned invalid JSON"
+    return "AI unavailable"
+
+
+async def _parse_one(text: str):
+    while True:
+        try:
+            return await parse_text_strict(text, background=True), None
+        except LLMBusyError:
+            # batch calls wait for a slot, but this one joined an identical
+            # interactive parse that was turned away: a full queue is
+            # transient, never an item result
+            await asyncio.sleep(BATCH_BUSY_RETRY_DELAY)
+        except Exception as e:
+            print("BATCH ITEM ERROR:", e)
+            return None, _error_message(e)
+
+
+async def _run_unit(unit: list, out: asyncio.Queue):
+    """Parse one work unit (a single text or a pack) and queue (text, result, error)."""
+    if len(unit) > 1:
+        try:
+            results = await parse_texts_packed(unit)
+        except Exception as e:
+            print("BATCH PACK ERROR:", e)
+            results = [None] * len(unit)
+        for text, result in zip(unit, results):
+            if result is None:
+                # dropped from the packed answer: retry on its own
+                result, error = await _parse_one(text)
+                await out.put((text, result, error))
+            else:
+                await out.put((text, result, None))
+        return
+    result, error = await _parse_one(unit[0])
+    await out.put((unit[0], result, error))
+
+
+async def run_batch(texts: list, pack: bool = False, concurrency: int = BATCH_CONCURRENCY):
+    """Parse `texts`, yielding {"index", "result"} or {"index", "error"} per
+    input as soon as it is ready (completion order, not input order).
+
+    Identical texts (after normalization) are parsed once, cached ones
+    never reach the model, and a failing case only fails its own items.
+    """
+    positions: dict[str, list] = {}
+    first_text: dict[str, str] = {}
+    for i, text in enumerate(texts):
+        key = normalize_text(text)
+        positions.setdefault(key, []).append(i)
+        first_text.setdefault(key, text)
+
+    pending = []
+    for key, text in first_text.items():
+        result = await cached_parse(text)
+        if result is not None:
+            for i in positions[key]:
+                yield {"index": i, "result": result}
+        else:
+            pending.append(text)
+
+    units = []
+    if pack:
+        short = [t for t in pending if len(t) <= PACK_MAX_CHARS]
+        units += [short[i:i + PACK_SIZE] for i in range(0, len(short), PACK_SIZE)]
+        units += [[t] for t in pending if len(t) > PACK_MAX_CHARS]
+    else:
+        units = [[t] for t in pending]
+
+    work: asyncio.Queue = asyncio.Queue()
+    for unit in units:
+        work.put_nowait(unit)
+    out: asyncio.Queue = asyncio.Queue()
+
+    async def worker():
+        while True:
+            try:
+                unit = work.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await _run_unit(unit, out)
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(units)))]
+    try:
+        for _ in range(len(pending)):
+            text, result, error = await out.get()
+            for i in positions[normalize_text(text)]:
+                if error is None:
+                    yield {"index": i, "result": result}
+                else:
+                    yield {"index": i, "error": error}
+    finally:
+        # client went away (or we are done): don't leave workers running
+        for w in workers:
+            w.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+
+# ---------------------------------------------------------------------------
+# job mode: results persisted through `database`, independent of the client
+# ---------------------------------------------------------------------------
+
+_job_tasks: dict = {}
+_resume_task: asyncio.Task | None = None
+
+
+def worker_id() -> str:
+    # not cached at import: with preload_app the module is imported before fork
+    return "%s:%d" % (socket.gethostname(), os.getpid())
+
+
+async def create_job(practitioner_id: int, texts: list, pack: bool = False) -> str:
+    job_id = uuid.uuid4().hex
+    async with database.transaction():
+        await database.execute(parse_jobs.insert().values(
+            id=job_id, practitioner_id=practitioner_id, status="running", pack=pack,
+            total=len(texts), done=0, failed=0, created_at=datetime.utcnow(),
+            owner=worker_id(), heartbeat_at=func.now(),
+        ))
+        # execute_many sends one INSERT per row; multi-row VALUES per chunk
+        # keeps a 10k-item job to a handful of round trips
+        rows = [{"job_id": job_id, "item_index": i, "text": t} for i, t in enumerate(texts)]
+        for i in range(0, len(rows), JOB_INSERT_CHUNK):
+            await database.execute(parse_job_items.insert().values(rows[i:i + JOB_INSERT_CHUNK]))
+    _spawn(job_id, texts, pack)
+    return job_id
+
+
+def _spawn(job_id: str, texts: list, pack: bool, item_indexes: list | None = None):
+    task = asyncio.create_task(_run_job(job_id, texts, pack, item_indexes))
+    # keep a reference so the task isn't garbage collected mid-run
+    _job_tasks[job_id] = task
+    task.add_done_callback(lambda t: _job_tasks.pop(job_id) if _job_tasks.get(job_id) is t else None)
+
+
+async def _heartbeat(job_id: str, owner: str, job_task: asyncio.Task):
+    while True:
+        await asyncio.sleep(JOB_HEARTBEAT_INTERVAL)
+        try:
+            row = await database.fetch_one(
+                parse_jobs.update()
+                .where((parse_jobs.c.id == job_id) & (parse_jobs.c.owner == owner)
+                       & (parse_jobs.c.status == "running"))
+                .values(heartbeat_at=func.now())
+                .returning(parse_jobs.c.id)
+            )
+        except Exception as e:
+            print("BATCH HEARTBEAT ERROR:", e)
+            continue
+        if row is None:
+            # our heartbeat went stale and another worker claimed the job
+            job_task.cancel()
+            return
+
+
+async def _run_job(job_id: str, texts: list, pack: bool, item_indexes: list | None = None):
+    item_indexes = item_indexes or list(range(len(texts)))
+    owner = worker_id()
+    heartbeat = asyncio.create_task(_heartbeat(job_id, owner, asyncio.current_task()))
+    try:
+        async for item in run_batch(texts, pack):
+            index = item_indexes[item["index"]]
+            failed = "error" in item
+            row = await database.fetch_one(
+                parse_job_items.update()
+                .where(
+                    (parse_job_items.c.job_id == job_id) & (parse_job_items.c.item_index == index)
+                    & parse_job_items.c.result.is_(None) & parse_job_items.c.error.is_(None)
+                )
+                .values(
+                    result=None if failed else json.dumps(item["result"]),
+                    error=item.get("error"),
+                )
+                .returning(parse_job_items.c.item_index)
+            )
+            if row is None:
+                # already written by a previous owner: don't count it twice
+                continue
+            await database.execute(
+                parse_jobs.update().where(parse_jobs.c.id == job_id).values(
+                    done=parse_jobs.c.done + 1,
+                    failed=parse_jobs.c.failed + (1 if failed else 0),
+                )
+            )
+        status = "finished"
+    except asyncio.CancelledError:
+        # shutdown or takeover: leave it "running" for resume_jobs()
+        raise
+    except Exception as e:
+        print("BATCH JOB ERROR:", e)
+        status = "failed"
+    finally:
+        heartbeat.cancel()
+    await database.execute(
+        parse_jobs.update().where((parse_jobs.c.id == job_id) & (parse_jobs.c.owner == owner))
+        .values(status=status, finished_at=datetime.utcnow())
+    )
+
+
+async def resume_jobs():
+    """Claim running jobs whose owner stopped sending heartbeats (crashed,
+    restarted, or another instance shut down) and run their unfinished
+    items. The claim is one UPDATE, so two workers never both get a job."""
+    try:
+        claimed = await database.fetch_all(
+            parse_jobs.update()
+            .where(
+                (parse_jobs.c.status == "running")
+                & or_(
+                    parse_jobs.c.heartbeat_at.is_(None),
+                    parse_jobs.c.heartbeat_at < func.now() - func.make_interval(0, 0, 0, 0, 0, 0, JOB_STALE_AFTER),
+                )
+            )
+            .values(owner=worker_id(), heartbeat_at=func.now())
+            .returning(parse_jobs.c.id, parse_jobs.c.pack)
+        )
+        for job in claimed:
+            if job["id"] in _job_tasks:
+                # still running here; the claim just refreshed its heartbeat
+                continue
+            items = await database.fetch_all(
+                parse_job_items.select()
+                .where(
+                    (parse_job_items.c.job_id == job["id"])
+                    & parse_job_items.c.result.is_(None)
+                    & parse_job_items.c.error.is_(None)
+                )
+                .order_by(parse_job_items.c.item_index)
+            )
+            if items:
+                _spawn(job["id"], [r["text"] for r in items], job["pack"], [r["item_index"] for r in items])
+            else:
+                await database.execute(
+                    parse_jobs.update().where(parse_jobs.c.id == job["id"])
+                    .values(status="finished", finished_at=datetime.utcnow())
+                )
+    except Exception as e:
+        print("BATCH RESUME ERROR:", e)
+
+
+async def _resume_loop():
+    while True:
+        await resume_jobs()
+        await asyncio.sleep(JOB_STALE_AFTER / 2)
+
+
+def start_job_resumer():
+    """Resume orphaned jobs now and keep sweeping for them, so jobs left by
+    an instance that went away are picked up without a restart here."""
+    global _resume_task
+    if _resume_task is None:
+        _resume_task = asyncio.create_task(_resume_loop())
+
+
+async def cancel_jobs():
+    global _resume_task
+    if _resume_task is not None:
+        _resume_task.cancel()
+        await asyncio.gather(_resume_task, return_exceptions=True)
+        _resume_task = None
+    job_ids = list(_job_tasks)
+    for task in list(_job_tasks.values()):
+        task.cancel()
+    await asyncio.gather(*_job_tasks.values(), return_exceptions=True)
+    if job_ids:
+        # hand them over now rather than after JOB_STALE_AFTER
+        try:
+            await database.execute(
+                parse_jobs.update()
+                .where(parse_jobs.c.id.in_(job_ids) & (parse_jobs.c.owner == worker_id())
+                       & (parse_jobs.c.status == "running"))
+                .values(heartbeat_at=None)
+            )
+        except Exception as e:
+            print("BATCH RESUME ERROR:", e)
+
+
+async def get_job(practitioner_id: int, job_id: str, offset: int = 0, limit: int = 100):
+    job = await database.fetch_one(
+        parse_jobs.select()
+        .where((parse_jobs.c.id == job_id) & (parse_jobs.c.practitioner_id == practitioner_id))
+    )
+    if job is None:
+        return None
+    items = await database.fetch_all(
+        parse_job_items.select()
+        .where((parse_job_items.c.job_id == job_id) & (parse_job_items.c.item_index >= offset))
+        .order_by(parse_job_items.c.item_index)
+        .limit(limit)
+    )
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "total": job["total"],
+        "done": job["done"],
+        "failed": job["failed"],
+        "created_at": job["created_at"].isoformat(),
+        "finished_at": job["finished_at"].isoformat() if job["finished_at"] else None,
+        "items": [
+            {
+                "index": r["item_index"],
+                "result": json.loads(r["result"]) if r["result"] else None,
+                "error": r["error"],
+            }
+            for r in items
+        ],
+    }
@@ -0,0 +1,258 @@
+# backend/app/cache.py
+import os
+import json
+import time
+import asyncio
+import hashlib
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from . import metrics
+from .database import database
+from .models import llm_cache
+
+LLM_CACHE_SIZE = int(os.environ.get("LLM_CACHE_SIZE", "2048"))
+LLM_CACHE_TTL = float(os.environ.get("LLM_CACHE_TTL", str(60 * 60 * 24)))
+# second tier in Postgres, shared across workers and restarts
+LLM_CACHE_DB = os.environ.get("LLM_CACHE_DB", "0").lower() in ("1", "true", "yes")
+# how often (seconds) a worker deletes expired llm_cache rows, piggybacked on writes
+LLM_CACHE_PRUNE_INTERVAL = float(os.environ.get("LLM_CACHE_PRUNE_INTERVAL", "3600"))
+
+
+def normalize_text(text: str) -> str:
+    # NFC + collapsed whitespace: re-submits after trivial UI edits hit the same key
+    text = unicodedata.normalize("NFC", text)
+    return " ".join(text.split())
+
+
+def cache_key(text: str, model: str, system_prompt: str, temperature: float) -> str:
+    h = hashlib.sha256()
+    for part in (model, system_prompt, repr(float(temperature)), normalize_text(text)):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class _Abandoned(Exception):
+    """An in-flight computation ended without a result for its waiters."""
+
+
+class ResponseCache:
+    """LRU + TTL cache of decoded LLM responses with an optional DB tier.
+
+    Values are stored as JSON text so every caller gets its own copy and the
+    DB tier can share the same representation.
+    """
+
+    def __init__(self, maxsize: int = LLM_CACHE_SIZE, ttl: float = LLM_CACHE_TTL, use_db: bool = LLM_CACHE_DB):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.use_db = use_db
+        self._data: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._last_prune = float("-inf")
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "db_hits": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+    def __len__(self):
+        return len(self._data)
+
+    # only touched from the event loop, so the LRU needs no lock
+    def get(self, key: str):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, raw = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.stats["expirations"] += 1
+            return None
+        self._data.move_to_end(key)
+        return json.loads(raw)
+
+    def set(self, key: str, value):
+        self._set_raw(key, json.dumps(value))
+
+    def _set_raw(self, key: str, raw: str):
+        self._data[key] = (time.monotonic() + self.ttl, raw)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def clear(self):
+        self._data.clear()
+
+    async def lookup(self, key: str):
+        """Cached value from either tier, or None on a miss.
+
+        If the same key is being computed right now, waits for that result
+        instead of reporting a miss; its exception, if any, is re-raised.
+        """
+        while True:
+            value = self.get(key)
+            if value is not None:
+                self.stats["hits"] += 1
+                return value
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            self.stats["coalesced"] += 1
+            try:
+                return json.loads(await self._wait(pending))
+            except _Abandoned:
+                continue
+
+        raw = await self._db_get(key)
+        if raw is not None:
+            self.stats["db_hits"] += 1
+            self._set_raw(key, raw)
+            return json.loads(raw)
+        self.stats["misses"] += 1
+        return None
+
+    async def get_or_compute(self, key: str, compute):
+        """Return the cached value for `key` or await `compute()` once.
+
+        Concurrent callers with the same key share a single in-flight
+        computation; if it raises, every waiter sees the exception and
+        nothing is cached. The computation runs in its own task, so a
+        caller that is cancelled (client gone) only stops waiting: the
+        others still get the result.
+        """
+        while True:
+            value = await self.lookup(key)
+            if value is not None:
+                return value
+            if key in self._inflight:
+                # someone started it while we were reading the DB tier
+                continue
+            task = asyncio.ensure_future(self._fill(key, compute))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, key=key: self._settle(key, t))
+            try:
+                return json.loads(await self._wait(task))
+            except _Abandoned:
+                continue
+
+    def claim(self, key: str) -> bool:
+        """Mark `key` as being computed by the caller, for results that can't
+        come from one `compute()` call (a streamed completion). Lookups for
+        it wait until the caller calls store() or abandon(). False when
+        another computation already holds the key."""
+        if key in self._inflight:
+            return False
+        self._inflight[key] = asyncio.get_running_loop().create_future()
+        return True
+
+    def abandon(self, key: str):
+        """Give up a claim without a result; waiters go and compute it themselves."""
+        self._release(key, None)
+
+    async def store(self, key: str, value):
+        """Write a value to both tiers, settling a claim on `key` if there is one."""
+        raw = json.dumps(value)
+        self._set_raw(key, raw)
+        self._release(key, raw)
+        await self._db_set(key, raw)
+
+    def _release(self, key: str, raw: str | None):
+        future = self._inflight.get(key)
+        # tasks from get_or_compute settle themselves
+        if future is None or isinstance(future, asyncio.Task):
+            return
+        del self._inflight[key]
+        if raw is not None:
+            future.set_result(raw)
+        else:
+            future.set_exception(_Abandoned())
+            future.exception()
+
+    async def _fill(self, key: str, compute):
+        raw = json.dumps(await compute())
+        self._set_raw(key, raw)
+        await self._db_set(key, raw)
+        return raw
+
+    def _settle(self, key: str, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # mark retrieved so a failure nobody awaited doesn't log a warning
+            task.exception()
+
+    @staticmethod
+    async def _wait(pending):
+        try:
+            return await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            # the computation itself was cancelled (shutdown), not us: let
+            # the caller start over rather than see someone else's cancel
+            if pending.cancelled() and not asyncio.current_task().cancelling():
+                raise _Abandoned()
+            raise
+
+    async def _db_get(self, key: str):
+        if not self.use_db:
+            return None
+        try:
+            row = await database.fetch_one(llm_cache.select().where(llm_cache.c.key == key))
+            if row is None:
+                return None
+            if row["created_at"] < datetime.utcnow() - timedelta(seconds=self.ttl):
+                await database.execute(
+                    llm_cache.delete().where(
+                        (llm_cache.c.key == key) & (llm_cache.c.created_at == row["created_at"])
+                    )
+                )
+                self.stats["expirations"] += 1
+                return None
+            return row["value"]
+        except Exception as e:
+            print("CACHE DB ERROR:", e)
+            return None
+
+    async def _db_set(self, key: str, raw: str):
+        if not self.use_db:
+            return
+        try:
+            query = pg_insert(llm_cache).values(
+                key=key, value=raw, created_at=datetime.utcnow()
+            ).on_conflict_do_update(
+                index_elements=[llm_cache.c.key],
+                set_={"value": raw, "created_at": datetime.utcnow()},
+            )
+            await database.execute(query)
+            await self._db_prune()
+        except Exception as e:
+            print("CACHE DB ERROR:", e)
+
+    async def _db_prune(self):
+        now = time.monotonic()
+        if now - self._last_prune < LLM_CACHE_PRUNE_INTERVAL:
+            return
+        self._last_prune = now
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl)
+        await database.execute(llm_cache.delete().where(llm_cache.c.created_at < cutoff))
+
+    def snapshot(self):
+        return {**self.stats, "size": len(self._data), "maxsize": self.maxsize}
+
+
+response_cache = ResponseCache()
+
+for _stat in ("hits", "misses", "db_hits", "coalesced", "evictions", "expirations"):
+    metrics.Gauge(
+        "llm_cache_%s_total" % _stat, "Response cache %s" % _stat.replace("_", " "),
+        lambda stat=_stat: response_cache.stats[stat], kind="counter",
+    )
+metrics.Gauge("llm_cache_entries", "Entries in the in-process response cache", lambda: len(response_cache))
@@ -0,0 +1,275 @@
+# backend/app/cases.py
+import os
+import json
+import base64
+from datetime import datetime
+
+from asyncpg.exceptions import UniqueViolationError
+from sqlalchemy import select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from .ai import parse_text_strict, parse_cache_key, fallback_parse, LLMBusyError
+from .database import database
+from .models import cases, case_rubrics
+
+CASES_PAGE_MAX = int(os.environ.get("CASES_PAGE_MAX", "200"))
+CASES_BULK_MAX = int(os.environ.get("CASES_BULK_MAX", "1000"))
+# rows per INSERT ... VALUES statement in a bulk upsert
+CASES_BULK_CHUNK = int(os.environ.get("CASES_BULK_CHUNK", "500"))
+
+# list pages never carry text or parse results
+SUMMARY_COLUMNS = (
+    cases.c.id, cases.c.client_ref, cases.c.patient_name, cases.c.status,
+    cases.c.created_at, cases.c.updated_at, cases.c.parsed_at,
+)
+
+
+class DuplicateClientRefError(Exception):
+    """Raised when another of the practitioner's cases already has that
+    client_ref; callers should answer 409."""
+
+
+def _is_client_ref_conflict(e: UniqueViolationError) -> bool:
+    return getattr(e, "constraint_name", None) == "uq_cases_practitioner_client_ref"
+
+
+def encode_cursor(updated_at: datetime, case_id: int) -> str:
+    raw = "%s|%d" % (updated_at.isoformat(), case_id)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Inverse of encode_cursor; raises ValueError on anything malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        stamp, _, case_id = raw.rpartition("|")
+        return datetime.fromisoformat(stamp), int(case_id)
+    except Exception:
+        raise ValueError("invalid cursor")
+
+
+def _summary(row) -> dict:
+    return {
+        "id": row["id"],
+        "client_ref": row["client_ref"],
+        "patient_name": row["patient_name"],
+        "status": row["status"],
+        "created_at": row["created_at"].isoformat(),
+        "updated_at": row["updated_at"].isoformat(),
+        "parsed": row["parsed_at"] is not None,
+    }
+
+
+async def list_cases(practitioner_id: int, limit: int = 50, cursor: str | None = None,
+                     status: str | None = None):
+    """One page of a practitioner's cases, newest first.
+
+    Keyset pagination on (updated_at, id): each page is an index range scan
+    starting at the cursor, so page 1 and page 2000 cost the same (OFFSET
+    would walk and discard every earlier row).
+    """
+    limit = max(1, min(limit, CASES_PAGE_MAX))
+    query = select(*SUMMARY_COLUMNS).where(cases.c.practitioner_id == practitioner_id)
+    if status:
+        query = query.where(cases.c.status == status)
+    if cursor:
+        updated_at, case_id = decode_cursor(cursor)
+        query = query.where(tuple_(cases.c.updated_at, cases.c.id) < tuple_(updated_at, case_id))
+    query = query.order_by(cases.c.updated_at.desc(), cases.c.id.desc()).limit(limit + 1)
+
+    rows = await database.fetch_all(query)
+    more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1]["updated_at"], rows[-1]["id"]) if more else None
+    return {"items": [_summary(r) for r in rows], "next_cursor": next_cursor}
+
+
+def stored_parse(row):
+    """The case row's stored parse result, or None when there is none or it
+    was made for other text (or another model or prompt)."""
+    if row["parse_result"] is None or row["parse_key"] != parse_cache_key(row["text"]):
+        return None
+    return json.loads(row["parse_result"])
+
+
+async def _fetch_case(practitioner_id: int, case_id: int):
+    return await database.fetch_one(
+        cases.select().where((cases.c.id == case_id) & (cases.c.practitioner_id == practitioner_id))
+    )
+
+
+async def get_case(practitioner_id: int, case_id: int):
+    row = await _fetch_case(practitioner_id, case_id)
+    if row is None:
+        return None
+    rubrics = await database.fetch_all(
+        case_rubrics.select().where(case_rubrics.c.case_id == case_id).order_by(case_rubrics.c.position)
+    )
+    return {
+        **_summary(row),
+        "text": row["text"],
+        "parse_result": stored_parse(row),
+        "rubrics": [
+            {"rubric_id": r["rubric_id"], "path": r["path"], "weight": r["weight"], "confidence": r["confidence"]}
+            for r in rubrics
+        ],
+    }
+
+
+def _case_values(practitioner_id: int, case, now: datetime) -> dict:
+    return {
+        "practitioner_id": practitioner_id,
+        "client_ref": case.client_ref,
+        "patient_name": case.patient_name,
+        "status": case.status,
+        "text": case.text,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+async def create_case(practitioner_id: int, case) -> int:
+    try:
+        return await database.execute(
+            cases.insert().values(**_case_values(practitioner_id, case, datetime.utcnow()))
+        )
+    except UniqueViolationError as e:
+        if _is_client_ref_conflict(e):
+            raise DuplicateClientRefError(case.client_ref)
+        raise
+
+
+async def update_case(practitioner_id: int, case_id: int, case) -> bool:
+    try:
+        row = await database.fetch_one(
+            cases.update()
+            .where((cases.c.id == case_id) & (cases.c.practitioner_id == practitioner_id))
+            .values(
+                client_ref=case.client_ref, patient_name=case.patient_name, status=case.status,
+                text=case.text, updated_at=datetime.utcnow(),
+            )
+            .returning(cases.c.id)
+        )
+    except UniqueViolationError as e:
+        if _is_client_ref_conflict(e):
+            raise DuplicateClientRefError(case.client_ref)
+        raise
+    return row is not None
+
+
+def bulk_values(practitioner_id: int, items: list, now: datetime) -> list:
+    """Row values for a bulk upsert, one per distinct case, in input order.
+    A client_ref repeated in one payload: the last one wins (ON CONFLICT
+    refuses to touch the same row twice in one statement)."""
+    last = {c.client_ref: i for i, c in enumerate(items) if c.client_ref is not None}
+    return [
+        _case_values(practitioner_id, c, now) for i, c in enumerate(items)
+        if c.client_ref is None or last[c.client_ref] == i
+    ]
+
+
+async def bulk_upsert(practitioner_id: int, items: list) -> list:
+    """Insert or update many cases, keyed on client_ref when given.
+
+    Multi-row INSERT ... ON CONFLICT statements of CASES_BULK_CHUNK rows,
+    one transaction for the lot. A stored parse_result survives the update;
+    it is simply no longer current if the text changed (see parse_case).
+    Returns [{"id", "client_ref"}] in input order, one per distinct case.
+    """
+    values = bulk_values(practitioner_id, items, datetime.utcnow())
+    keyed = [v for v in values if v["client_ref"] is not None]
+    unkeyed = [v for v in values if v["client_ref"] is None]
+    by_ref = {}
+    async with database.transaction():
+        for i in range(0, len(keyed), CASES_BULK_CHUNK):
+            stmt = pg_insert(cases).values(keyed[i:i + CASES_BULK_CHUNK])
+            stmt = stmt.on_conflict_do_update(
+                constraint="uq_cases_practitioner_client_ref",
+                set_={
+                    "patient_name": stmt.excluded.patient_name,
+                    "status": stmt.excluded.status,
+                    "text": stmt.excluded.text,
+                    "updated_at": stmt.excluded.updated_at,
+                },
+            ).returning(cases.c.id, cases.c.client_ref)
+            by_ref.update((r["client_ref"], r["id"]) for r in await database.fetch_all(stmt))
+        if unkeyed:
+            # RETURNING order is not guaranteed to follow VALUES order, and
+            # rows without a client_ref have nothing else to match on: take
+            # their ids from the sequence up front and insert them explicitly
+            rows = await database.fetch_all(
+                "SELECT nextval(pg_get_serial_sequence('cases', 'id')) AS id"
+                " FROM generate_series(1, CAST(:n AS integer))",
+                {"n": len(unkeyed)},
+            )
+            for v, r in zip(unkeyed, rows):
+                v["id"] = r["id"]
+            for i in range(0, len(unkeyed), CASES_BULK_CHUNK):
+                await database.execute(cases.insert().values(unkeyed[i:i + CASES_BULK_CHUNK]))
+    return [
+        {"id": v["id"] if v["client_ref"] is None else by_ref[v["client_ref"]], "client_ref": v["client_ref"]}
+        for v in values
+    ]
+
+
+async def set_rubrics(practitioner_id: int, case_id: int, rubrics: list) -> bool:
+    """Replace a case's rubric selection."""
+    async with database.transaction():
+        row = await database.fetch_one(
+            cases.update()
+            .where((cases.c.id == case_id) & (cases.c.practitioner_id == practitioner_id))
+            .values(updated_at=datetime.utcnow())
+            .returning(cases.c.id)
+        )
+        if row is None:
+            return False
+        await database.execute(case_rubrics.delete().where(case_rubrics.c.case_id == case_id))
+        if rubrics:
+            await database.execute(case_rubrics.insert().values([
+                {
+                    "case_id": case_id,
+                    "position": i,
+                    "rubric_id": r.rubric_id,
+                    "path": r.path or "",
+                    "weight": r.weight,
+                    "confidence": r.confidence,
+                }
+                for i, r in enumerate(rubrics)
+            ]))
+    return True
+
+
+async def parse_case(practitioner_id: int, case_id: int):
+    """Parse result for a case, from the case row when its text is unchanged.
+
+    Only real LLM answers are stored; a fallback is returned but not kept,
+    so the next open tries the model again. Raises LLMBusyError when the
+    queue is full. Returns None for an unknown case.
+    """
+    row = await _fetch_case(practitioner_id, case_id)
+    if row is None:
+        return None
+    stored = stored_parse(row)
+    if stored is not None:
+        return {"source": "stored", "parsed_at": row["parsed_at"].isoformat(), "result": stored}
+    if not row["text"].strip():
+        return {"source": "fallback", "parsed_at": None, "result": fallback_parse(row["text"])}
+
+    try:
+        result = await parse_text_strict(row["text"])
+    except LLMBusyError:
+        raise
+    except Exception as e:
+        print("CASE PARSE ERROR:", e)
+        return {"source": "fallback", "parsed_at": None, "result": fallback_parse(row["text"])}
+
+    key = parse_cache_key(row["text"])
+    now = datetime.utcnow()
+    # if the text was edited meanwhile this result belongs to the old text:
+    # don't store it against the new one
+    await database.execute(
+        cases.update()
+        .where((cases.c.id == case_id) & (cases.c.text == row["text"]))
+        .values(parse_result=json.dumps(result), parse_key=key, parsed_at=now)
+    )
+    return {"source": "llm", "parsed_at": now.isoformat(), "result": result}
@@ -1,9 +1,9 @@
 # backend/app/create_tables.py
-from .database import engine, metadata
-from .models import users
+from .database import get_engine
+from .models import metadata
 
 def create():
-    metadata.create_all(bind=engine)
+    metadata.create_all(bind=get_engine())
     print("Tables created (if not present)")
 
 if __name__ == "__main__":
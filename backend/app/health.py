@@ -0,0 +1,63 @@
+# backend/app/health.py
+import os
+import time
+import asyncio
+
+from .ai import ping_llm
+from .database import database, pool_stats
+
+READY_DB_TIMEOUT = float(os.environ.get("READY_DB_TIMEOUT", "2"))
+READY_LLM_TIMEOUT = float(os.environ.get("READY_LLM_TIMEOUT", "2"))
+# probes come every few seconds per worker; reuse an LLM check this long
+# instead of hitting the provider on each one
+READY_LLM_TTL = float(os.environ.get("READY_LLM_TTL", "30"))
+# AI routes fall back to local parsing, so by default an unreachable LLM
+# only reports "degraded" and the worker stays in rotation
+READY_REQUIRE_LLM = os.environ.get("READY_REQUIRE_LLM", "0").lower() in ("1", "true", "yes")
+
+_draining = [False]
+_llm_state = {"ok": None, "error": None, "checked_at": 0.0}
+
+
+def set_draining():
+    _draining[0] = True
+
+
+def liveness() -> dict:
+    # answered from the event loop, so a response means the loop isn't stuck;
+    # deliberately touches nothing external
+    return {"status": "ok", "pid": os.getpid()}
+
+
+async def _check_db() -> dict:
+    t0 = time.perf_counter()
+    try:
+        await asyncio.wait_for(database.fetch_val("SELECT 1"), READY_DB_TIMEOUT)
+    except Exception as e:
+        return {"ok": False, "error": str(e) or type(e).__name__, "pool": pool_stats()}
+    return {"ok": True, "latency_ms": round((time.perf_counter() - t0) * 1000, 2), "pool": pool_stats()}
+
+
+async def _check_llm() -> dict:
+    if time.time() - _llm_state["checked_at"] > READY_LLM_TTL:
+        try:
+            await ping_llm(READY_LLM_TIMEOUT)
+            _llm_state.update(ok=True, error=None)
+        except Exception as e:
+            _llm_state.update(ok=False, error=str(e) or type(e).__name__)
+        _llm_state["checked_at"] = time.time()
+    return {"ok": _llm_state["ok"], "error": _llm_state["error"]}
+
+
+async def readiness():
+    """(ready, report): ready means the DB pool answers, the worker isn't
+    shutting down and, with READY_REQUIRE_LLM, the LLM is reachable."""
+    db, llm = await asyncio.gather(_check_db(), _check_llm())
+    ready = db["ok"] and not _draining[0] and (llm["ok"] or not READY_REQUIRE_LLM)
+    if _draining[0]:
+        status = "draining"
+    elif not ready:
+        status = "unavailable"
+    else:
+        status = "ready" if llm["ok"] else "degraded"
+    return ready, {"status": status, "pid": os.getpid(), "db": db, "llm": llm}
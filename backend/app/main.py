@@ -1,19 +1,37 @@
 # backend/app/main.py
 import os
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Depends, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
 
 from dotenv import load_dotenv
 load_dotenv()
 
 # relative imports inside the package
 from .database import database
-from .schemas import UserCreate, UserLogin, Token
-from .auth import create_user, authenticate_user
-from .ai import parse_text_endpoint
+from .schemas import (
+    UserCreate, UserLogin, Token, RepertorizeRequest, BatchParseRequest,
+    CaseIn, CaseBulkIn, CaseRubricsIn,
+)
+from .auth import (
+    create_user, authenticate_user, decode_access_claims, user_id_for, shutdown_hash_pool,
+)
+from .ai import parse_text_async, parse_text_stream, close_async_client, LLMBusyError
+from .cache import response_cache
+from .streaming import sse_event
+from .rubric_index import get_rubric_index
+from .repertorize import get_repertory_engine
+from . import metrics, health
+from .batch import (
+    run_batch, create_job, get_job, start_job_resumer, cancel_jobs, BATCH_MAX_ITEMS, JOB_MAX_ITEMS,
+)
+from . import cases as case_store
 
 app = FastAPI(title="Reperto AI Backend")
 
+metrics.instrument_database(database)
+app.add_middleware(metrics.MetricsMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # for dev only; restrict in prod
@@ -22,13 +40,50 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def warm_up():
+    # load the repertory files before the first request needs them; under
+    # gunicorn with preload_app this runs once in the master, and workers
+    # share the loaded pages copy-on-write
+    get_rubric_index()
+    get_repertory_engine()
+
 @app.on_event("startup")
 async def startup():
+    metrics.start_loop_lag_monitor()
+    warm_up()
     await database.connect()
+    # read here, not at import: gunicorn.conf.py sets it after fork so only
+    # one worker resumes interrupted jobs
+    if os.environ.get("RESUME_JOBS", "1") != "0":
+        start_job_resumer()
 
 @app.on_event("shutdown")
 async def shutdown():
+    health.set_draining()
+    await cancel_jobs()
+    await metrics.stop_loop_lag_monitor()
     await database.disconnect()
+    await close_async_client()
+    shutdown_hash_pool()
+
+async def current_claims(authorization: str | None = Header(default=None)):
+    # JWT-only check: no DB round trip and no bcrypt on authenticated routes
+    scheme, _, token = (authorization or "").partition(" ")
+    claims = decode_access_claims(token) if scheme.lower() == "bearer" and token else None
+    if claims is None:
+        raise HTTPException(status_code=401, detail="Not authenticated",
+                            headers={"WWW-Authenticate": "Bearer"})
+    return claims
+
+async def current_user(claims: dict = Depends(current_claims)):
+    return claims["sub"]
+
+async def current_practitioner(claims: dict = Depends(current_claims)):
+    user_id = await user_id_for(claims)
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Not authenticated",
+                            headers={"WWW-Authenticate": "Bearer"})
+    return user_id
 
 @app.post("/auth/signup", response_model=dict)
 async def signup(payload: UserCreate):
@@ -44,10 +99,240 @@ async def login(payload: UserLogin):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     return {"access_token": token, "token_type": "bearer"}
 
+@app.get("/auth/me")
+async def me(email: str = Depends(current_user)):
+    return {"email": email}
+
 @app.post("/ai/parse-text")
 async def parse_text(body: dict):
     text = body.get("text", "").strip()
     if not text:
         raise HTTPException(status_code=400, detail="No text provided")
 
-    return parse_text_endpoint(text)
+    try:
+        return await parse_text_async(text)
+    except LLMBusyError:
+        raise HTTPException(status_code=429, detail="AI is busy, retry shortly",
+                            headers={"Retry-After": "1"})
+
+@app.post("/ai/parse-text/stream")
+async def parse_text_sse(body: dict):
+    text = body.get("text", "").strip()
+    if not text:
+        raise HTTPException(status_code=400, detail="No text provided")
+
+    events = parse_text_stream(text)
+    # pull the first event here so a full queue is still a plain 429
+    try:
+        first = await events.__anext__()
+    except LLMBusyError:
+        raise HTTPException(status_code=429, detail="AI is busy, retry shortly",
+                            headers={"Retry-After": "1"})
+
+    async def body_iter():
+        yield sse_event(*first)
+        async for event in events:
+            yield sse_event(*event)
+
+    return StreamingResponse(
+        body_iter(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _batch_texts(payload: BatchParseRequest, max_items: int) -> list:
+    texts = [t.strip() for t in payload.texts]
+    if not texts:
+        raise HTTPException(status_code=400, detail="No texts provided")
+    if len(texts) > max_items:
+        raise HTTPException(status_code=413, detail="At most %d texts per request" % max_items)
+    if not all(texts):
+        raise HTTPException(status_code=400, detail="Empty text at index %d" % texts.index(""))
+    return texts
+
+
+@app.post("/ai/parse-batch")
+async def parse_batch(payload: BatchParseRequest):
+    texts = _batch_texts(payload, BATCH_MAX_ITEMS)
+
+    if payload.stream:
+        async def body_iter():
+            done = failed = 0
+            async for item in run_batch(texts, payload.pack):
+                done += 1
+                failed += "error" in item
+                yield sse_event("item", item)
+                yield sse_event("progress", {"done": done, "total": len(texts)})
+            yield sse_event("done", {"total": len(texts), "failed": failed})
+
+        return StreamingResponse(
+            body_iter(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    results = [None] * len(texts)
+    async for item in run_batch(texts, payload.pack):
+        results[item["index"]] = item
+    failed = sum(1 for r in results if "error" in r)
+    return {"total": len(texts), "failed": failed, "results": results}
+
+
+@app.post("/ai/parse-batch/jobs", status_code=202)
+async def parse_batch_job(payload: BatchParseRequest, practitioner_id: int = Depends(current_practitioner)):
+    texts = _batch_texts(payload, JOB_MAX_ITEMS)
+    job_id = await create_job(practitioner_id, texts, payload.pack)
+    return {"job_id": job_id, "status": "running", "total": len(texts)}
+
+
+@app.get("/ai/parse-batch/jobs/{job_id}")
+async def parse_batch_job_status(job_id: str, offset: int = 0, limit: int = 100,
+                                 practitioner_id: int = Depends(current_practitioner)):
+    job = await get_job(practitioner_id, job_id, max(offset, 0), max(1, min(limit, 1000)))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.post("/repertorize")
+async def repertorize(payload: RepertorizeRequest):
+    engine = get_repertory_engine()
+    if engine is None:
+        raise HTTPException(status_code=503, detail="Repertory not loaded")
+
+    index = get_rubric_index()
+    rubric_ids, weights, unmatched = [], [], []
+    for r in payload.rubrics:
+        rid = r.rubric_id
+        if rid is None and r.path and index is not None:
+            hit = index.snap(r.path)
+            rid = hit[0] if hit else None
+        if rid is None or not 0 <= rid < engine.n_rubrics:
+            unmatched.append(r.path or r.rubric_id)
+            continue
+        rubric_ids.append(rid)
+        weights.append(r.weight)
+
+    try:
+        results = engine.rank(rubric_ids, weights, payload.method, max(1, min(payload.top_k, 100)))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if index is not None:
+        for remedy in results:
+            for m in remedy["matched_rubrics"]:
+                m["path"] = index.path(m["rubric_id"])
+    return {"method": payload.method, "results": results, "unmatched": unmatched}
+
+
+@app.get("/rubrics/search")
+async def rubric_search(q: str, mode: str = "search", limit: int = 10):
+    index = get_rubric_index()
+    if index is None:
+        raise HTTPException(status_code=503, detail="Repertory not loaded")
+    limit = max(1, min(limit, 100))
+    if mode == "prefix":
+        return [{"rubric_id": rid, "path": path} for rid, path in index.prefix(q, limit)]
+    if mode != "search":
+        raise HTTPException(status_code=400, detail="mode must be 'search' or 'prefix'")
+    return [
+        {"rubric_id": rid, "path": path, "score": score}
+        for rid, path, score in index.search(q, limit)
+    ]
+
+
+@app.get("/cases")
+async def list_cases(limit: int = 50, cursor: str | None = None, status: str | None = None,
+                     practitioner_id: int = Depends(current_practitioner)):
+    try:
+        return await case_store.list_cases(practitioner_id, limit, cursor, status)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/cases", status_code=201)
+async def create_case(payload: CaseIn, practitioner_id: int = Depends(current_practitioner)):
+    try:
+        case_id = await case_store.create_case(practitioner_id, payload)
+    except case_store.DuplicateClientRefError:
+        raise HTTPException(status_code=409, detail="client_ref already used by another case")
+    return {"id": case_id}
+
+
+@app.put("/cases/bulk")
+async def bulk_upsert_cases(payload: CaseBulkIn, practitioner_id: int = Depends(current_practitioner)):
+    if len(payload.cases) > case_store.CASES_BULK_MAX:
+        raise HTTPException(status_code=413, detail="At most %d cases per request" % case_store.CASES_BULK_MAX)
+    return {"items": await case_store.bulk_upsert(practitioner_id, payload.cases)}
+
+
+@app.get("/cases/{case_id}")
+async def get_case(case_id: int, practitioner_id: int = Depends(current_practitioner)):
+    case = await case_store.get_case(practitioner_id, case_id)
+    if case is None:
+        raise HTTPException(status_code=404, detail="Case not found")
+    return case
+
+
+@app.put("/cases/{case_id}")
+async def update_case(case_id: int, payload: CaseIn, practitioner_id: int = Depends(current_practitioner)):
+    try:
+        updated = await case_store.update_case(practitioner_id, case_id, payload)
+    except case_store.DuplicateClientRefError:
+        raise HTTPException(status_code=409, detail="client_ref already used by another case")
+    if not updated:
+        raise HTTPException(status_code=404, detail="Case not found")
+    return {"id": case_id}
+
+
+@app.put("/cases/{case_id}/rubrics")
+async def set_case_rubrics(case_id: int, payload: CaseRubricsIn,
+                           practitioner_id: int = Depends(current_practitioner)):
+    if not await case_store.set_rubrics(practitioner_id, case_id, payload.rubrics):
+        raise HTTPException(status_code=404, detail="Case not found")
+    return {"id": case_id, "rubrics": len(payload.rubrics)}
+
+
+@app.post("/cases/{case_id}/parse")
+async def parse_case(case_id: int, practitioner_id: int = Depends(current_practitioner)):
+    try:
+        parsed = await case_store.parse_case(practitioner_id, case_id)
+    except LLMBusyError:
+        raise HTTPException(status_code=429, detail="AI is busy, retry shortly",
+                            headers={"Retry-After": "1"})
+    if parsed is None:
+        raise HTTPException(status_code=404, detail="Case not found")
+    return parsed
+
+
+@app.get("/livez")
+async def livez():
+    return health.liveness()
+
+
+@app.get("/readyz")
+async def readyz():
+    ready, report = await health.readiness()
+    return JSONResponse(report, status_code=200 if ready else 503)
+
+
+@app.get("/ai/cache-stats")
+async def cache_stats():
+    return response_cache.snapshot()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/debug/profile", response_class=PlainTextResponse)
+async def debug_profile(seconds: float = 10):
+    # off unless PROFILER_ENABLED=1; returns collapsed stacks of the event loop
+    if not metrics.PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    try:
+        return await metrics.profile_event_loop(seconds)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
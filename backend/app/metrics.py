@@ -0,0 +1,270 @@
+# backend/app/metrics.py
+import os
+import sys
+import time
+import asyncio
+import bisect
+import threading
+from collections import Counter as _Tally
+
+# Minimal Prometheus text-format registry. Metrics are per process: with
+# several workers, scrape each one (or put them behind a per-pod scrape).
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+LOOP_LAG_INTERVAL = float(os.environ.get("LOOP_LAG_INTERVAL", "0.5"))
+PROFILER_ENABLED = os.environ.get("PROFILER_ENABLED", "0").lower() in ("1", "true", "yes")
+PROFILER_MAX_SECONDS = float(os.environ.get("PROFILER_MAX_SECONDS", "60"))
+
+_registry = []
+
+
+def _fmt_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (extra or [])
+    if not pairs:
+        return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{%s}" % ",".join('%s="%s"' % (k, esc(v)) for k, v in pairs)
+
+
+def _fmt_value(v: float) -> str:
+    return repr(float(v)) if v != int(v) else str(int(v))
+
+
+class Counter:
+    def __init__(self, name: str, doc: str, labels=()):
+        self.name, self.doc, self.labels = name, doc, tuple(labels)
+        self._values: dict[tuple, float] = {}
+        _registry.append(self)
+
+    def inc(self, *label_values, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        yield "# HELP %s %s" % (self.name, self.doc)
+        yield "# TYPE %s counter" % self.name
+        for lv, v in sorted(self._values.items()):
+            yield "%s%s %s" % (self.name, _fmt_labels(self.labels, lv), _fmt_value(v))
+
+
+class Gauge:
+    """Value read from a callback at scrape time. `kind="counter"` exposes
+    counts that are kept elsewhere (e.g. the response cache's stats)."""
+
+    def __init__(self, name: str, doc: str, fn, kind: str = "gauge"):
+        self.name, self.doc, self.fn, self.kind = name, doc, fn, kind
+        _registry.append(self)
+
+    def render(self):
+        yield "# HELP %s %s" % (self.name, self.doc)
+        yield "# TYPE %s %s" % (self.name, self.kind)
+        yield "%s %s" % (self.name, _fmt_value(self.fn()))
+
+
+class Histogram:
+    def __init__(self, name: str, doc: str, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.doc, self.labels = name, doc, tuple(labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._values: dict[tuple, list] = {}
+        _registry.append(self)
+
+    def observe(self, value: float, *label_values):
+        row = self._values.get(label_values)
+        if row is None:
+            row = self._values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        row[bisect.bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    def render(self):
+        yield "# HELP %s %s" % (self.name, self.doc)
+        yield "# TYPE %s histogram" % self.name
+        for lv, row in sorted(self._values.items()):
+            cumulative = 0
+            for le, n in zip(self.buckets + ("+Inf",), row[:-1]):
+                cumulative += n
+                yield "%s_bucket%s %d" % (self.name, _fmt_labels(self.labels, lv, [("le", le)]), cumulative)
+            yield "%s_sum%s %s" % (self.name, _fmt_labels(self.labels, lv), repr(row[-1]))
+            yield "%s_count%s %d" % (self.name, _fmt_labels(self.labels, lv), cumulative)
+
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+http_latency = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route",
+    ("method", "route", "status"),
+)
+loop_lag = Histogram(
+    "event_loop_lag_seconds", "Delay of a periodic event-loop timer beyond its deadline",
+    buckets=LAG_BUCKETS,
+)
+db_latency = Histogram(
+    "db_query_duration_seconds", "Database call latency by operation and table",
+    ("op", "table"), buckets=DB_BUCKETS,
+)
+llm_latency = Histogram(
+    "llm_request_duration_seconds", "Upstream LLM call latency",
+    ("mode", "outcome"),
+)
+llm_tokens = Counter("llm_tokens_total", "Tokens reported by the LLM", ("kind",))
+llm_fallbacks = Counter("llm_fallbacks_total", "Parse requests answered by the local fallback", ("reason",))
+llm_parses = Counter("llm_parse_requests_total", "Parse requests that reached the LLM layer")
+
+
+# ---------------------------------------------------------------------------
+# HTTP middleware
+# ---------------------------------------------------------------------------
+
+class MetricsMiddleware:
+    """ASGI middleware timing each request until its last body chunk.
+
+    Labelled by the matched route template (not the raw path) so that
+    `/ai/parse-batch/jobs/{job_id}` stays one series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            http_latency.observe(time.perf_counter() - start, scope["method"], path, str(status[0]))
+
+
+# ---------------------------------------------------------------------------
+# event-loop lag
+# ---------------------------------------------------------------------------
+
+_lag_task = None
+_lag_max = [0.0]
+
+
+async def _watch_loop_lag():
+    while True:
+        t0 = time.perf_counter()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        lag = max(0.0, time.perf_counter() - t0 - LOOP_LAG_INTERVAL)
+        loop_lag.observe(lag)
+        _lag_max[0] = max(_lag_max[0], lag)
+
+
+def start_loop_lag_monitor():
+    global _lag_task
+    if _lag_task is None:
+        _lag_task = asyncio.create_task(_watch_loop_lag())
+
+
+async def stop_loop_lag_monitor():
+    global _lag_task
+    if _lag_task is not None:
+        _lag_task.cancel()
+        await asyncio.gather(_lag_task, return_exceptions=True)
+        _lag_task = None
+
+
+Gauge("event_loop_lag_max_seconds", "Largest event-loop lag seen since start", lambda: _lag_max[0])
+
+
+# ---------------------------------------------------------------------------
+# database timings
+# ---------------------------------------------------------------------------
+
+def _from_names(from_) -> list:
+    if hasattr(from_, "left") and hasattr(from_, "right"):  # a JOIN
+        return _from_names(from_.left) + _from_names(from_.right)
+    name = getattr(from_, "name", None)
+    return [name] if name else []
+
+
+def _table_of(query) -> str:
+    table = getattr(query, "table", None)
+    if table is not None and hasattr(table, "name"):
+        return table.name
+    froms = getattr(query, "get_final_froms", None)
+    if froms is not None:
+        return ",".join(n for f in froms() for n in _from_names(f)) or "unknown"
+    return "raw"
+
+
+def instrument_database(database):
+    """Wrap the query methods of a `databases.Database` to record timings."""
+    if getattr(database, "_metrics_instrumented", False):
+        return database
+    for op in ("execute", "execute_many", "fetch_one", "fetch_all", "fetch_val"):
+        original = getattr(database, op)
+
+        async def timed(query, *args, _original=original, _op=op, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return await _original(query, *args, **kwargs)
+            finally:
+                db_latency.observe(time.perf_counter() - t0, _op, _table_of(query))
+
+        setattr(database, op, timed)
+    database._metrics_instrumented = True
+    return database
+
+
+# ---------------------------------------------------------------------------
+# sampling profiler
+# ---------------------------------------------------------------------------
+
+_profile_lock = threading.Lock()
+
+
+def _sample_stacks(thread_id: int, seconds: float, interval: float) -> _Tally:
+    """Sample one thread's Python stack; returns collapsed-stack counts."""
+    stacks = _Tally()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append("%s (%s:%d)" % (code.co_name, os.path.basename(code.co_filename), frame.f_lineno))
+            frame = frame.f_back
+        if names:
+            stacks[";".join(reversed(names))] += 1
+        time.sleep(interval)
+    return stacks
+
+
+async def profile_event_loop(seconds: float, interval: float = 0.005) -> str:
+    """Sample the event-loop thread for `seconds` from a helper thread.
+
+    Output is collapsed stacks ("frame;frame;frame count"), ready for
+    flamegraph.pl or speedscope. Frames sitting in the selector are idle
+    time; anything else near the top is work (or blocking) on the loop.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise RuntimeError("a profile is already running")
+    try:
+        seconds = max(0.1, min(seconds, PROFILER_MAX_SECONDS))
+        loop_thread = threading.get_ident()
+        stacks = await asyncio.get_running_loop().run_in_executor(
+            None, _sample_stacks, loop_thread, seconds, interval
+        )
+    finally:
+        _profile_lock.release()
+    return "".join("%s %d\n" % (stack, n) for stack, n in stacks.most_common())
@@ -1,7 +1,11 @@
 # backend/app/models.py
-from sqlalchemy import Table, Column, Integer, String, MetaData
+from sqlalchemy import (
+    Table, Column, Integer, BigInteger, Boolean, String, Text, DateTime, Float, ForeignKey,
+    Index, UniqueConstraint,
+)
 
-metadata = MetaData()
+# one MetaData for the whole app, so create_tables.py sees every table
+from .database import metadata
 
 users = Table(
     "users",
@@ -11,3 +15,81 @@ users = Table(
     Column("email", String(150), unique=True, nullable=False),
     Column("password_hash", String(255), nullable=False),
 )
+
+# cached LLM responses, keyed by sha256 of model + prompt + temperature + text
+llm_cache = Table(
+    "llm_cache",
+    metadata,
+    Column("key", String(64), primary_key=True),
+    Column("value", Text, nullable=False),
+    Column("created_at", DateTime, nullable=False),
+    # expired rows are pruned by age (ResponseCache._db_prune)
+    Index("ix_llm_cache_created_at", "created_at"),
+)
+
+# background batch-parse imports; items keep their text so a job can resume
+parse_jobs = Table(
+    "parse_jobs",
+    metadata,
+    Column("id", String(32), primary_key=True),
+    Column("practitioner_id", Integer, ForeignKey("users.id", ondelete="CASCADE")),
+    Column("status", String(20), nullable=False),
+    Column("pack", Boolean, nullable=False, default=False),
+    Column("total", Integer, nullable=False),
+    Column("done", Integer, nullable=False, default=0),
+    Column("failed", Integer, nullable=False, default=0),
+    Column("created_at", DateTime, nullable=False),
+    Column("finished_at", DateTime),
+    # the process running the job ("host:pid") and its last sign of life;
+    # a running job whose heartbeat went stale is claimed by another worker
+    Column("owner", String(100)),
+    Column("heartbeat_at", DateTime),
+    Index("ix_parse_jobs_status_heartbeat", "status", "heartbeat_at"),
+)
+
+parse_job_items = Table(
+    "parse_job_items",
+    metadata,
+    Column("job_id", String(32), ForeignKey("parse_jobs.id", ondelete="CASCADE"), primary_key=True),
+    Column("item_index", Integer, primary_key=True),
+    Column("text", Text, nullable=False),
+    Column("result", Text),
+    Column("error", Text),
+)
+
+# practitioner cases; parse_result is stored next to the text it came from
+# (parse_key = response cache key of that text) so reopening a case never
+# re-calls the LLM unless the text changed
+cases = Table(
+    "cases",
+    metadata,
+    Column("id", BigInteger, primary_key=True),
+    Column("practitioner_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+    Column("client_ref", String(64)),
+    Column("patient_name", String(150), nullable=False, default=""),
+    Column("status", String(20), nullable=False, default="open"),
+    Column("text", Text, nullable=False, default=""),
+    Column("parse_result", Text),
+    Column("parse_key", String(64)),
+    Column("parsed_at", DateTime),
+    Column("created_at", DateTime, nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+    # bulk upserts from the app are idempotent on the device-side id
+    UniqueConstraint("practitioner_id", "client_ref", name="uq_cases_practitioner_client_ref"),
+    # keyset pagination: newest first within one practitioner
+    Index("ix_cases_practitioner_updated", "practitioner_id", "updated_at", "id"),
+    Index("ix_cases_practitioner_status_updated", "practitioner_id", "status", "updated_at", "id"),
+)
+
+case_rubrics = Table(
+    "case_rubrics",
+    metadata,
+    Column("case_id", BigInteger, ForeignKey("cases.id", ondelete="CASCADE"), primary_key=True),
+    Column("position", Integer, primary_key=True),
+    Column("rubric_id", Integer),
+    Column("path", String(500), nullable=False),
+    Column("weight", Float, nullable=False, default=1.0),
+    Column("confidence", Float),
+    # "which cases use rubric X" for repertory-wide lookups
+    Index("ix_case_rubrics_rubric", "rubric_id"),
+)
@@ -0,0 +1,187 @@
+# backend/app/repertorize.py
+import os
+import tempfile
+
+import numpy as np
+from scipy import sparse
+
+from .rubric_index import REPERTORY_PATH, read_repertory
+
+MAX_GRADE = 3
+METHODS = ("totality", "weighted", "count")
+
+
+def parse_grades(field: str):
+    """Parse "bell:3 nux-v:2" into [("bell", 3), ("nux-v", 2)], skipping bad items."""
+    out = []
+    for item in field.split():
+        name, _, grade = item.rpartition(":")
+        if not name:
+            name, grade = grade, "1"
+        try:
+            g = int(grade)
+        except ValueError:
+            continue
+        if g > 0:
+            out.append((name, min(g, MAX_GRADE)))
+    return out
+
+
+def build_matrix(src: str, out: str):
+    remedy_ids: dict[str, int] = {}
+    indptr = [0]
+    indices, data = [], []
+    for _, field in read_repertory(src):
+        row = {}
+        for name, grade in parse_grades(field):
+            col = remedy_ids.setdefault(name, len(remedy_ids))
+            row[col] = max(grade, row.get(col, 0))
+        for col in sorted(row):
+            indices.append(col)
+            data.append(row[col])
+        indptr.append(len(indices))
+
+    remedies = sorted(remedy_ids, key=remedy_ids.get)
+    # same as build_index: unique temp file in the target dir, atomic swap
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(out) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(
+                f,
+                indptr=np.asarray(indptr, dtype=np.int32),
+                indices=np.asarray(indices, dtype=np.int32),
+                data=np.asarray(data, dtype=np.int8),
+                remedies=np.asarray(remedies, dtype=str),
+            )
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, out)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _dedupe(rubric_ids, weights):
+    """Case rubric ids without repeats (a repeat keeps its highest weight),
+    as an int64 array plus the matching float weights."""
+    best = {}
+    for i, rid in enumerate(rubric_ids):
+        w = 1.0 if weights is None else float(weights[i])
+        if w > best.get(rid, -np.inf):
+            best[rid] = w
+    ids = np.fromiter(best, dtype=np.int64, count=len(best))
+    return ids, np.fromiter(best.values(), dtype=np.float64, count=len(best))
+
+
+class RepertoryEngine:
+    """Rubric x remedy grade matrix (CSR) and batched case scoring."""
+
+    def __init__(self, grades: sparse.csr_matrix, remedies):
+        self.grades = grades
+        self.remedies = [str(r) for r in remedies]
+
+    @classmethod
+    def load(cls, src: str) -> "RepertoryEngine":
+        out = src + ".grades.npz"
+        if not os.path.exists(out) or os.path.getmtime(out) < os.path.getmtime(src):
+            build_matrix(src, out)
+        with np.load(out) as f:
+            remedies = f["remedies"]
+            grades = sparse.csr_matrix(
+                (f["data"], f["indices"], f["indptr"]),
+                shape=(len(f["indptr"]) - 1, len(remedies)),
+            )
+        return cls(grades, remedies)
+
+    @property
+    def n_rubrics(self) -> int:
+        return self.grades.shape[0]
+
+    def score(self, rubric_ids, weights=None):
+        """Score every remedy for a case in one pass.
+
+        Returns (totality, weighted, count) dense vectors over remedies:
+        sum of grades, sum of grade * rubric weight, and number of case
+        rubrics the remedy appears in.
+        """
+        rubric_ids, w = _dedupe(rubric_ids, weights)
+        return self._score(*self._gather(rubric_ids), w)
+
+    def _gather(self, rubric_ids):
+        """(row in case, remedy column, grade) of every grade in the case's
+        rows, read straight off the CSR arrays: no submatrix is built."""
+        g = self.grades
+        starts = g.indptr[rubric_ids]
+        lengths = g.indptr[rubric_ids + 1] - starts
+        rows = np.repeat(np.arange(len(rubric_ids)), lengths)
+        pos = np.arange(len(rows)) + np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+        return rows, g.indices[pos], g.data[pos]
+
+    def _score(self, rows, cols, grades, w):
+        n = len(self.remedies)
+        totality = np.bincount(cols, weights=grades, minlength=n)
+        weighted = np.bincount(cols, weights=grades * w[rows], minlength=n)
+        count = np.bincount(cols, minlength=n)
+        return totality, weighted, count
+
+    def rank(self, rubric_ids, weights=None, method: str = "totality", top_k: int = 10):
+        if method not in METHODS:
+            raise ValueError("method must be one of %s" % ", ".join(METHODS))
+        rubric_ids, w = _dedupe(rubric_ids, weights)
+        if not len(rubric_ids):
+            return []
+        rows, cols, grades = self._gather(rubric_ids)
+        totality, weighted, count = self._score(rows, cols, grades, w)
+        primary = {"totality": totality, "weighted": weighted, "count": count}[method]
+
+        candidates = np.flatnonzero(count > 0)
+        if len(candidates) > top_k:
+            # coarse cut on the primary score, then exact tie-aware ordering
+            cut = np.argpartition(-primary[candidates], top_k - 1)[:top_k]
+            threshold = primary[candidates[cut]].min()
+            candidates = candidates[primary[candidates] >= threshold]
+        order = np.lexsort((-totality[candidates], -count[candidates], -primary[candidates]))
+        top = candidates[order][:top_k]
+
+        max_score = {
+            "totality": MAX_GRADE * len(rubric_ids),
+            "weighted": MAX_GRADE * float(w.sum()),
+            "count": len(rubric_ids),
+        }[method] or 1.0
+
+        # matched rubrics for the few winners only, in case order; plain
+        # Python values from here on, numpy scalars are slow to box one by one
+        top = top.tolist()
+        matched = {col: [] for col in top}
+        sel = np.flatnonzero(np.isin(cols, top))
+        for col, rid, grade in zip(cols[sel].tolist(), rubric_ids[rows[sel]].tolist(), grades[sel].tolist()):
+            matched[col].append({"rubric_id": rid, "grade": grade})
+        results = []
+        for col, p, t, wt, c in zip(top, primary[top].tolist(), totality[top].tolist(),
+                                    weighted[top].tolist(), count[top].tolist()):
+            results.append({
+                "remedy": self.remedies[col],
+                "score": round(float(p), 3),
+                "percentage": round(100 * float(p) / max_score),
+                "totality": int(t),
+                "weighted": round(wt, 3),
+                "rubric_count": c,
+                "matched_rubrics": matched[col],
+            })
+        return results
+
+
+_engine: RepertoryEngine | None = None
+_engine_loaded = False
+
+
+def get_repertory_engine() -> RepertoryEngine | None:
+    """Process-wide engine from REPERTORY_PATH, or None when not configured."""
+    global _engine, _engine_loaded
+    if not _engine_loaded:
+        _engine_loaded = True
+        if REPERTORY_PATH:
+            try:
+                _engine = RepertoryEngine.load(REPERTORY_PATH)
+            except Exception as e:
+                print("REPERTORY ENGINE ERROR:", e)
+    return _engine
@@ -0,0 +1,371 @@
+# backend/app/rubric_index.py
+import os
+import re
+import math
+import mmap
+import struct
+import bisect
+import difflib
+import tempfile
+from array import array
+
+import numpy as np
+
+# Repertory source format: one rubric per line, path segments joined by ">",
+# optionally followed by a tab and remedy grades used by the scoring engine:
+#
+#   Head > Pain > Night<TAB>bell:3 nux-v:2 sulph:1
+#
+# Blank lines and lines starting with "#" are ignored. A rubric's ID is its
+# 0-based position among the non-comment lines, so it is stable as long as
+# the source file is only appended to.
+#
+# The source is compiled once into a flat binary file (`<source>.idx`) that
+# is memory-mapped read-only: every uvicorn worker shares the same page-cache
+# pages instead of building its own Python dicts.
+
+REPERTORY_PATH = os.environ.get("REPERTORY_PATH")
+RUBRIC_SNAP_MIN_SCORE = float(os.environ.get("RUBRIC_SNAP_MIN_SCORE", "0.6"))
+# share of a token's idf credited when it only matched after typo correction
+FUZZY_MATCH_WEIGHT = 0.7
+
+MAGIC = b"RPIX0001"
+# path_off, path_blob, norm_off, norm_blob, sorted_ids, weight,
+# vocab_off, vocab_blob, post_off, postings, idf
+N_SECTIONS = 11
+HEADER = struct.Struct("<8sII" + "II" * N_SECTIONS)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it of on or the to with "
+    "was were this that patient reports complains".split()
+)
+
+
+def tokenize(text: str) -> list:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def normalize_path(path: str) -> str:
+    segments = [" ".join(tokenize(s)) for s in path.split(">")]
+    return " > ".join(s for s in segments if s)
+
+
+def read_repertory(src: str):
+    """Yield (path, grades_field) for each rubric line of a repertory file."""
+    with open(src, encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            path, _, grades = line.partition("\t")
+            yield " > ".join(s.strip() for s in path.split(">")), grades
+
+
+def _pack_strings(strings):
+    offsets = array("I", [0])
+    blob = bytearray()
+    for s in strings:
+        blob += s.encode("utf-8")
+        offsets.append(len(blob))
+    return offsets.tobytes(), bytes(blob)
+
+
+def build_index(src: str, out: str):
+    paths = [p for p, _ in read_repertory(src)]
+    norms = [normalize_path(p) for p in paths]
+    n = len(paths)
+
+    postings: dict[str, list] = {}
+    rubric_tokens = []
+    for rid, norm in enumerate(norms):
+        toks = set(tokenize(norm))
+        rubric_tokens.append(toks)
+        for t in toks:
+            postings.setdefault(t, []).append(rid)
+
+    vocab = sorted(postings)
+    idf = array("f", (math.log(1 + n / len(postings[t])) for t in vocab))
+    idf_by_token = dict(zip(vocab, idf))
+    weight = array("f", (sum(idf_by_token[t] for t in toks) for toks in rubric_tokens))
+    sorted_ids = array("I", sorted(range(n), key=norms.__getitem__))
+
+    post_off = array("I", [0])
+    flat = array("I")
+    for t in vocab:
+        flat.extend(postings[t])
+        post_off.append(len(flat))
+
+    path_off, path_blob = _pack_strings(paths)
+    norm_off, norm_blob = _pack_strings(norms)
+    vocab_off, vocab_blob = _pack_strings(vocab)
+    sections = [
+        path_off, path_blob, norm_off, norm_blob, sorted_ids.tobytes(),
+        weight.tobytes(), vocab_off, vocab_blob, post_off.tobytes(),
+        flat.tobytes(), idf.tobytes(),
+    ]
+
+    layout = []
+    pos = HEADER.size
+    for data in sections:
+        pos += -pos % 4  # keep typed sections 4-byte aligned
+        layout += [pos, len(data)]
+        pos += len(data)
+
+    # unique name in the target dir: workers building at once don't share
+    # a temp file, and the swap is atomic so none of them maps a half file
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(out) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(MAGIC, n, len(vocab), *layout))
+            for data, off in zip(sections, layout[::2]):
+                f.write(b"\0" * (off - f.tell()))
+                f.write(data)
+        os.chmod(tmp, 0o644)  # mkstemp creates it owner-only
+        os.replace(tmp, out)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class _Strings:
+    """Read-only sequence of strings over an offsets array and a byte blob."""
+
+    def __init__(self, offsets, blob, order=None):
+        self._off = offsets
+        self._blob = blob
+        self._order = order
+        self._len = len(order) if order is not None else len(offsets) - 1
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, i):
+        if self._order is not None:
+            i = self._order[i]
+        return str(self._blob[self._off[i]:self._off[i + 1]], "utf-8")
+
+
+class RubricIndex:
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self._mm)
+        magic, self.size, n_vocab, *layout = HEADER.unpack_from(buf)
+        if magic != MAGIC:
+            raise ValueError("%s is not a rubric index" % path)
+        sec = [buf[off:off + length] for off, length in zip(layout[::2], layout[1::2])]
+
+        self._paths = _Strings(sec[0].cast("I"), sec[1])
+        self._norms = _Strings(sec[2].cast("I"), sec[3])
+        self._sorted_ids = sec[4].cast("I")
+        self._sorted_norms = _Strings(sec[2].cast("I"), sec[3], order=self._sorted_ids)
+        self._vocab = _Strings(sec[6].cast("I"), sec[7])
+        self._post_off = sec[8].cast("I")
+        # numpy views over the same mapped pages (no copy) for vector scoring
+        self._weight = np.frombuffer(sec[5], dtype=np.float32)
+        self._postings = np.frombuffer(sec[9], dtype=np.uint32)
+        self._idf = np.frombuffer(sec[10], dtype=np.float32)
+        # what a query token missing from the vocabulary costs: as much as
+        # the rarest known token, so unknown words can't be ignored
+        self._max_idf = float(self._idf.max()) if len(self._idf) else 1.0
+        self._fuzzy_cache: dict[str, int] = {}
+
+    @classmethod
+    def load(cls, src: str) -> "RubricIndex":
+        """Open a compiled index, (re)building it from a source repertory
+        when the `.idx` file is missing or older than the source."""
+        if src.endswith(".idx"):
+            return cls(src)
+        out = src + ".idx"
+        if not os.path.exists(out) or os.path.getmtime(out) < os.path.getmtime(src):
+            build_index(src, out)
+        return cls(out)
+
+    def __len__(self):
+        return self.size
+
+    def path(self, rid: int) -> str:
+        return self._paths[rid]
+
+    # -- token helpers -----------------------------------------------------
+
+    def _token_id(self, token: str) -> int:
+        i = bisect.bisect_left(self._vocab, token)
+        if i < len(self._vocab) and self._vocab[i] == token:
+            return i
+        return -1
+
+    def _fuzzy_token_id(self, token: str) -> int:
+        tid = self._token_id(token)
+        # short words and numbers are too ambiguous to typo-correct
+        if tid >= 0 or len(token) < 4 or token.isdigit():
+            return tid
+        if token in self._fuzzy_cache:
+            return self._fuzzy_cache[token]
+        # only compare against vocabulary sharing the first two letters
+        lo = bisect.bisect_left(self._vocab, token[:2])
+        hi = bisect.bisect_left(self._vocab, token[:2] + "\uffff")
+        # a ratio >= 0.8 needs the longer word at most 1.5x the shorter one
+        n = len(token)
+        candidates = [
+            c for c in (self._vocab[i] for i in range(lo, hi))
+            if 2 * n <= 3 * len(c) and 2 * len(c) <= 3 * n
+        ]
+        match = difflib.get_close_matches(token, candidates, n=1, cutoff=0.8)
+        tid = self._token_id(match[0]) if match else -1
+        if len(self._fuzzy_cache) > 10000:
+            self._fuzzy_cache.clear()
+        self._fuzzy_cache[token] = tid
+        return tid
+
+    def _posting(self, tid: int):
+        return self._postings[self._post_off[tid]:self._post_off[tid + 1]]
+
+    def _query_tokens(self, tokens):
+        """({token id: credit}, idf of unknown tokens) for query tokens.
+
+        Exact vocabulary hits get full credit, typo-corrected ones
+        FUZZY_MATCH_WEIGHT, and tokens with no match at all are charged
+        `_max_idf` each so they still count against the similarity.
+        """
+        matched: dict[int, float] = {}
+        missing = 0.0
+        for tok in set(tokens):
+            tid = self._token_id(tok)
+            credit = 1.0
+            if tid < 0:
+                tid = self._fuzzy_token_id(tok)
+                credit = FUZZY_MATCH_WEIGHT
+            if tid < 0:
+                missing += self._max_idf
+            elif credit > matched.get(tid, 0.0):
+                matched[tid] = credit
+        return matched, missing
+
+    def _score_tokens(self, matched: dict):
+        """(rubric ids, credited idf overlap) for every rubric sharing a query token."""
+        overlap = np.zeros(self.size, dtype=np.float32)
+        for tid, credit in matched.items():
+            # postings hold each rubric once per token, so plain += is safe
+            overlap[self._posting(tid)] += self._idf[tid] * credit
+        ids = np.flatnonzero(overlap > 0)
+        return ids, overlap[ids]
+
+    # -- lookups -----------------------------------------------------------
+
+    def exact(self, path: str) -> int:
+        norm = normalize_path(path)
+        i = bisect.bisect_left(self._sorted_norms, norm)
+        if i < self.size and self._sorted_norms[i] == norm:
+            return int(self._sorted_ids[i])
+        return -1
+
+    def prefix(self, query: str, limit: int = 20) -> list:
+        """Rubrics whose normalized path starts with `query` (e.g. "head > pain")."""
+        norm = normalize_path(query)
+        if query.rstrip().endswith(">"):
+            norm += " >"
+        i = bisect.bisect_left(self._sorted_norms, norm)
+        out = []
+        while i < self.size and len(out) < limit:
+            if not self._sorted_norms[i].startswith(norm):
+                break
+            rid = self._sorted_ids[i]
+            out.append((rid, self._paths[rid]))
+            i += 1
+        return out
+
+    def search(self, query: str, limit: int = 10) -> list:
+        """Token/fuzzy search ranked by idf-weighted Dice similarity."""
+        matched, missing = self._query_tokens(tokenize(query))
+        if not matched:
+            return []
+        q_weight = float(self._idf[list(matched)].sum()) + missing
+        ids, overlap = self._score_tokens(matched)
+        scores = 2 * overlap / (q_weight + self._weight[ids])
+        top = _top_k(scores, limit)
+        return [(int(ids[i]), self._paths[ids[i]], round(float(scores[i]), 4)) for i in top]
+
+    def snap(self, path: str):
+        """Canonical (rubric_id, path, score) for a free-text path, or None."""
+        rid = self.exact(path)
+        if rid >= 0:
+            return rid, self._paths[rid], 1.0
+        hits = self.search(path, limit=1)
+        if hits and hits[0][2] >= RUBRIC_SNAP_MIN_SCORE:
+            return hits[0]
+        return None
+
+    def extract(self, text: str, limit: int = 5, min_coverage: float = 0.6) -> list:
+        """No-LLM rubric extraction: rubrics whose tokens are mostly present
+        in `text`, in the same shape the model returns."""
+        tokens = [t for t in tokenize(text) if t not in STOPWORDS and len(t) > 2]
+        # free text is full of words no rubric uses: only matches count here
+        matched, _ = self._query_tokens(tokens)
+        if not matched:
+            return []
+        ids, overlap = self._score_tokens(matched)
+        weight = self._weight[ids]
+        coverage = overlap / np.maximum(weight, 1e-6)
+        keep = coverage >= min_coverage
+        ids, coverage, weight = ids[keep], coverage[keep], weight[keep]
+        # best coverage first; among equals prefer specific (heavier) rubrics
+        order = np.lexsort((-weight, -coverage))[:limit]
+        return [
+            {
+                "path": self._paths[ids[i]],
+                "confidence": round(min(float(coverage[i]), 1.0) * 0.7, 2),
+                "evidence": "local index",
+                "rubric_id": int(ids[i]),
+            }
+            for i in order
+        ]
+
+
+def _top_k(scores, k: int):
+    """Indices of the k largest scores, best first."""
+    if len(scores) > k:
+        part = np.argpartition(-scores, k)[:k]
+        return part[np.argsort(-scores[part], kind="stable")]
+    return np.argsort(-scores, kind="stable")
+
+
+_index: RubricIndex | None = None
+_index_loaded = False
+
+
+def get_rubric_index() -> RubricIndex | None:
+    """Process-wide index from REPERTORY_PATH, or None when not configured."""
+    global _index, _index_loaded
+    if not _index_loaded:
+        _index_loaded = True
+        if REPERTORY_PATH:
+            try:
+                _index = RubricIndex.load(REPERTORY_PATH)
+            except Exception as e:
+                print("RUBRIC INDEX ERROR:", e)
+    return _index
+
+
+def annotate_rubrics(result):
+    """Snap each LLM rubric in a parse result to a canonical rubric in place."""
+    index = get_rubric_index()
+    if index is None or not isinstance(result, dict):
+        return result
+    for rubric in result.get("rubrics") or []:
+        annotate_rubric(rubric, index)
+    return result
+
+
+def annotate_rubric(rubric, index: RubricIndex | None = None):
+    index = index or get_rubric_index()
+    if index is None or not isinstance(rubric, dict) or not rubric.get("path"):
+        return rubric
+    hit = index.snap(str(rubric["path"]))
+    if hit is None:
+        rubric["rubric_id"] = None
+        rubric["match_score"] = 0.0
+    else:
+        rubric["rubric_id"], rubric["canonical_path"], rubric["match_score"] = hit
+    return rubric
@@ -1,5 +1,5 @@
 # backend/app/schemas.py
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 
 class UserCreate(BaseModel):
     name: str
@@ -13,3 +13,31 @@ class UserLogin(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
+
+class CaseRubric(BaseModel):
+    rubric_id: int | None = None
+    path: str | None = Field(default=None, max_length=500)
+    weight: float = 1.0
+    confidence: float | None = None
+
+class RepertorizeRequest(BaseModel):
+    rubrics: list[CaseRubric]
+    method: str = "totality"
+    top_k: int = 10
+
+class BatchParseRequest(BaseModel):
+    texts: list[str]
+    pack: bool = False
+    stream: bool = False
+
+class CaseIn(BaseModel):
+    client_ref: str | None = Field(default=None, max_length=64)
+    patient_name: str = Field(default="", max_length=150)
+    status: str = Field(default="open", max_length=20)
+    text: str = ""
+
+class CaseBulkIn(BaseModel):
+    cases: list[CaseIn]
+
+class CaseRubricsIn(BaseModel):
+    rubrics: list[CaseRubric]
@@ -0,0 +1,125 @@
+# backend/app/streaming.py
+import json
+
+# top-level string fields surfaced as soon as their closing quote arrives
+SCALAR_FIELDS = ("summary", "risk")
+
+
+class IncrementalRubricParser:
+    """Tolerant incremental parser for the `{summary, risk, rubrics[]}` payload.
+
+    Feed it completion chunks as they arrive; each `feed()` returns the
+    events that became complete: ("summary", str), ("risk", str) and
+    ("rubric", dict) — one per rubric object as soon as its `}` closes.
+    Anything before the first `{` (code fences, chatter) is ignored, and a
+    rubric object that fails to decode is skipped rather than aborting the
+    stream.
+    """
+
+    def __init__(self):
+        self._buf = ""
+        self._i = 0
+        self._depth = 0
+        self._in_str = False
+        self._esc = False
+        self._str_start = -1
+        self._expect_key = False
+        self._key = None
+        self._item_start = -1
+        self._start = -1
+        self._end = -1
+        self.data = {"rubrics": []}
+
+    @property
+    def done(self) -> bool:
+        return self._end >= 0
+
+    def feed(self, chunk: str) -> list:
+        events = []
+        if self.done or not chunk:
+            return events
+        self._buf += chunk
+        buf = self._buf
+
+        i = self._i
+        n = len(buf)
+        while i < n and not self.done:
+            c = buf[i]
+
+            if self._in_str:
+                if self._esc:
+                    self._esc = False
+                elif c == "\\":
+                    self._esc = True
+                elif c == '"':
+                    self._in_str = False
+                    self._end_string(buf, i, events)
+            elif self._start < 0:
+                if c == "{":
+                    self._start = i
+                    self._depth = 1
+                    self._expect_key = True
+            elif c == '"':
+                self._in_str = True
+                self._str_start = i
+            elif c in "{[":
+                if self._depth == 2 and self._key == "rubrics" and c == "{":
+                    self._item_start = i
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+                if self._depth == 2 and self._key == "rubrics" and c == "}" and self._item_start >= 0:
+                    self._emit_rubric(_loads(buf[self._item_start:i + 1]), events)
+                    self._item_start = -1
+                elif self._depth == 0:
+                    self._end = i
+            elif self._depth == 1 and c == ",":
+                self._expect_key = True
+            i += 1
+
+        self._i = i
+        return events
+
+    def _end_string(self, buf: str, i: int, events: list):
+        if self._depth == 1:
+            text = _loads(buf[self._str_start:i + 1])
+            if self._expect_key:
+                self._key = text
+                self._expect_key = False
+            elif self._key in SCALAR_FIELDS and isinstance(text, str):
+                self.data[self._key] = text
+                events.append((self._key, text))
+        elif self._depth == 2 and self._key == "rubrics":
+            # the prompt forbids bare strings, but the model sometimes sends them
+            path = _loads(buf[self._str_start:i + 1])
+            if isinstance(path, str) and path:
+                self._emit_rubric({"path": path, "confidence": None, "evidence": ""}, events)
+
+    def _emit_rubric(self, rubric, events: list):
+        if not isinstance(rubric, dict):
+            return
+        self.data["rubrics"].append(rubric)
+        events.append(("rubric", rubric))
+
+    def result(self):
+        """Best available full object: the strict parse if it succeeds,
+        otherwise whatever fields were recovered incrementally. Rubrics are
+        always the normalized list that was emitted."""
+        full = None
+        if self.done:
+            full = _loads(self._buf[self._start:self._end + 1])
+        if not isinstance(full, dict):
+            full = dict(self.data)
+        full["rubrics"] = list(self.data["rubrics"])
+        return full
+
+
+def _loads(raw: str):
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return None
+
+
+def sse_event(event: str, data) -> str:
+    return "event: %s\ndata: %s\n\n" % (event, json.dumps(data))
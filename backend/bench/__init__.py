@@ -0,0 +1,2 @@
+# backend/bench/__init__.py
+# offline benchmarks and stubs — not imported by the app
@@ -0,0 +1,109 @@
+# backend/bench/cases_bench.py
+# Seed one practitioner with N cases (INSERT ... SELECT generate_series, so
+# seeding 100k rows takes seconds) and time list pages at increasing depth:
+# keyset (what GET /cases does) vs OFFSET. Also times a 1000-case bulk upsert.
+# Needs DATABASE_URL and the tables from create_tables.py:
+#
+#   python -m bench.cases_bench --cases 100000
+import time
+import asyncio
+import argparse
+import statistics
+
+from sqlalchemy import select
+
+from app import cases as case_store
+from app.database import database
+from app.models import cases, users
+from app.schemas import CaseIn
+
+SEED_EMAIL = "bench-cases@example.com"
+
+
+async def seed(n: int) -> int:
+    row = await database.fetch_one(users.select().where(users.c.email == SEED_EMAIL))
+    if row is None:
+        await database.execute(users.insert().values(name="bench", email=SEED_EMAIL, password_hash="-"))
+        row = await database.fetch_one(users.select().where(users.c.email == SEED_EMAIL))
+    pid = row["id"]
+    have = await database.fetch_val(
+        "SELECT count(*) FROM cases WHERE practitioner_id = :pid", {"pid": pid}
+    )
+    if have < n:
+        t0 = time.perf_counter()
+        # five minutes apart, newest first by g, with some status mix
+        await database.execute(
+            """
+            INSERT INTO cases (practitioner_id, client_ref, patient_name, status, text, created_at, updated_at)
+            SELECT :pid, 'seed-' || g, 'Patient ' || g,
+                   CASE WHEN g % 5 = 0 THEN 'closed' ELSE 'open' END,
+                   'headache worse at night, thirst for cold water ' || g,
+                   now() - (g || ' minutes')::interval * 5,
+                   now() - (g || ' minutes')::interval * 5
+            FROM generate_series(CAST(:lo AS integer), CAST(:hi AS integer)) AS g
+            ON CONFLICT DO NOTHING
+            """,
+            {"pid": pid, "lo": have + 1, "hi": n},
+        )
+        await database.execute("ANALYZE cases")
+        print("seeded %d cases in %.1f s" % (n - have, time.perf_counter() - t0))
+    return pid
+
+
+async def timed(fn, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+async def run(n: int, page: int, repeat: int):
+    await database.connect()
+    try:
+        pid = await seed(n)
+        total = await database.fetch_val(
+            "SELECT count(*) FROM cases WHERE practitioner_id = :pid", {"pid": pid}
+        )
+        print("practitioner %d: %d cases, page size %d, median of %d runs" % (pid, total, page, repeat))
+        print("%-10s %12s %12s" % ("depth", "keyset ms", "offset ms"))
+
+        order = (cases.c.updated_at.desc(), cases.c.id.desc())
+        for depth in (0, total // 100, total // 2, total - page):
+            cursor = None
+            if depth:
+                # the row just above this page, i.e. what the previous page's cursor points at
+                prev = await database.fetch_one(
+                    select(cases.c.updated_at, cases.c.id)
+                    .where(cases.c.practitioner_id == pid).order_by(*order).offset(depth - 1).limit(1)
+                )
+                cursor = case_store.encode_cursor(prev["updated_at"], prev["id"])
+
+            keyset = await timed(lambda: case_store.list_cases(pid, page, cursor), repeat)
+            offset = await timed(lambda: database.fetch_all(
+                select(*case_store.SUMMARY_COLUMNS)
+                .where(cases.c.practitioner_id == pid).order_by(*order).offset(depth).limit(page)
+            ), repeat)
+            print("%-10d %12.2f %12.2f" % (depth, keyset, offset))
+
+        items = [CaseIn(client_ref="bulk-%d" % i, patient_name="Bulk %d" % i, text="cough %d" % i)
+                 for i in range(1000)]
+        t0 = time.perf_counter()
+        await case_store.bulk_upsert(pid, items)
+        print("bulk upsert 1000 cases: %.1f ms" % ((time.perf_counter() - t0) * 1000))
+    finally:
+        await database.disconnect()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--cases", type=int, default=100000)
+    ap.add_argument("--page", type=int, default=50)
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+    asyncio.run(run(args.cases, args.page, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# backend/bench/gen_repertory.py
+# Generate a synthetic hierarchical repertory in the rubric_index source format.
+#
+#   python -m bench.gen_repertory /tmp/repertory.txt --rubrics 100000 --remedies 3000
+import random
+import argparse
+
+CHAPTERS = [
+    "Mind", "Vertigo", "Head", "Eye", "Vision", "Ear", "Hearing", "Nose", "Face",
+    "Mouth", "Teeth", "Throat", "Stomach", "Abdomen", "Rectum", "Stool", "Bladder",
+    "Kidneys", "Urine", "Genitalia", "Larynx", "Respiration", "Cough", "Expectoration",
+    "Chest", "Back", "Extremities", "Sleep", "Dreams", "Chill", "Fever",
+    "Perspiration", "Skin", "Generals",
+]
+SYMPTOMS = [
+    "Pain", "Burning", "Itching", "Heaviness", "Congestion", "Numbness", "Eruptions",
+    "Swelling", "Dryness", "Discharge", "Cramps", "Weakness", "Heat", "Coldness",
+    "Anxiety", "Fear", "Irritability", "Restlessness", "Sadness", "Nausea",
+    "Sleeplessness", "Trembling", "Pulsation", "Stiffness", "Constriction",
+]
+MODIFIERS = [
+    "Night", "Morning", "Evening", "Midnight", "Afternoon", "Motion", "Rest", "Eating",
+    "Walking", "Lying", "Pressure", "Cold air", "Warmth", "Damp weather", "Noise",
+    "Light", "Touch", "Stooping", "Menses", "Sleep", "Waking", "Anger", "Grief",
+    "Fright", "Coffee", "Wine", "Throbbing", "Stitching", "Tearing", "Sore", "Dull",
+    "Sharp", "Left side", "Right side", "Extending to neck", "Extending to shoulder",
+    "Before menses", "After eating", "During fever", "On rising", "Open air",
+]
+
+
+def remedy_names(count: int) -> list:
+    names, seen = [], set()
+    rng = random.Random(7)
+    while len(names) < count:
+        name = "".join(rng.choice("bcdfghklmnprstv") + rng.choice("aeiou") for _ in range(3))
+        name = "%s-%s" % (name[:4], name[4:])
+        if name not in seen:
+            seen.add(name)
+            names.append(name)
+    return names
+
+
+def generate(out: str, rubrics: int, remedies: int, seed: int = 42):
+    rng = random.Random(seed)
+    names = remedy_names(remedies)
+    # polychrests appear in far more rubrics than small remedies
+    weights = [1.0 / (i + 1) ** 0.8 for i in range(remedies)]
+    seen = set()
+    with open(out, "w", encoding="utf-8") as f:
+        f.write("# synthetic repertory: %d rubrics, %d remedies\n" % (rubrics, remedies))
+        while len(seen) < rubrics:
+            parts = [rng.choice(CHAPTERS), rng.choice(SYMPTOMS)]
+            for _ in range(rng.choice((0, 1, 1, 2, 2, 3))):
+                parts.append(rng.choice(MODIFIERS))
+            path = " > ".join(parts)
+            if path in seen:
+                path = "%s > %s %d" % (path, rng.choice(MODIFIERS), len(seen))
+            seen.add(path)
+            # broad rubrics (Chapter > Symptom) list hundreds of remedies,
+            # deep ones only a handful, as in real repertories
+            mean = {2: 250, 3: 40}.get(len(parts), 8)
+            count = min(remedies, max(1, int(rng.expovariate(1 / mean))))
+            chosen = set(rng.choices(range(remedies), weights=weights, k=count))
+            grades = " ".join("%s:%d" % (names[r], rng.choice((1, 1, 1, 2, 2, 3))) for r in sorted(chosen))
+            f.write("%s\t%s\n" % (path, grades))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("out")
+    ap.add_argument("--rubrics", type=int, default=100000)
+    ap.add_argument("--remedies", type=int, default=3000)
+    args = ap.parse_args()
+    generate(args.out, args.rubrics, args.remedies)
+
+
+if __name__ == "__main__":
+    main()
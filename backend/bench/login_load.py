@@ -0,0 +1,80 @@
+# backend/bench/login_load.py
+# Concurrent login storm: bcrypt verify inline on the event loop ("before")
+# vs the bounded hash pool ("after"). A heartbeat task measures how long the
+# loop is stalled, which is what every other request on the worker feels.
+# Runs in-process, so no database is needed:
+#
+#   python -m bench.login_load -n 64 -c 32
+import time
+import asyncio
+import argparse
+
+from app import auth
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+async def heartbeat(stop: asyncio.Event, lags: list, interval: float = 0.01):
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append((time.perf_counter() - t0 - interval) * 1000)
+
+
+async def inline_verify(password, password_hash):
+    # what authenticate_user did before: CPU-bound verify on the loop
+    return auth.pwd_ctx.verify(password, password_hash)
+
+
+async def storm(verify, password_hash, total, concurrency):
+    gate = asyncio.Semaphore(concurrency)
+    latencies, lags = [], []
+    stop = asyncio.Event()
+    beat = asyncio.create_task(heartbeat(stop, lags))
+
+    async def one(t0):
+        # t0 is taken when the request "arrives", so queueing behind a
+        # blocked loop counts, as a client would see it
+        async with gate:
+            assert await verify("correct horse", password_hash)
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    t_start = time.perf_counter()
+    await asyncio.gather(*(one(time.perf_counter()) for _ in range(total)))
+    wall = time.perf_counter() - t_start
+    stop.set()
+    await beat
+    return wall, latencies, lags or [0.0]
+
+
+async def run(total: int, concurrency: int):
+    password_hash = auth.pwd_ctx.hash("correct horse")
+    print("logins: %d, concurrency: %d, hash pool: %d threads"
+          % (total, concurrency, auth.PASSWORD_HASH_WORKERS))
+    for name, verify in (("inline (before)", inline_verify), ("pool (after)", auth.verify_password)):
+        wall, lat, lags = await storm(verify, password_hash, total, concurrency)
+        print("%-16s %6.1f logins/s   p50 %7.1f ms   p99 %7.1f ms   loop lag max %7.1f ms"
+              % (name, total / wall, percentile(lat, 50), percentile(lat, 99), max(lags)))
+
+    token = auth.create_access_token("someone@example.com")
+    auth.decode_access_claims(token)
+    t0 = time.perf_counter()
+    for _ in range(10000):
+        auth.decode_access_claims(token)
+    print("cached JWT check: %.2f us" % ((time.perf_counter() - t0) * 1e6 / 10000))
+    auth.shutdown_hash_pool()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", "--logins", type=int, default=64)
+    ap.add_argument("-c", "--concurrency", type=int, default=32)
+    args = ap.parse_args()
+    asyncio.run(run(args.logins, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# backend/bench/parse_load.py
+# Fire concurrent /ai/parse-text requests and report latency percentiles.
+#
+#   python -m bench.parse_load --url http://127.0.0.1:8000 -n 500 -c 120
+import time
+import asyncio
+import argparse
+import statistics
+
+import httpx
+
+SAMPLE_TEXT = (
+    "Patient reports throbbing headache that is worse at night, "
+    "irritable and impatient, nausea in the morning."
+)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[k]
+
+
+async def run(url: str, total: int, concurrency: int, path: str):
+    latencies = []
+    statuses = {}
+    gate = asyncio.Semaphore(concurrency)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=120) as http:
+        async def one(i):
+            async with gate:
+                t0 = time.perf_counter()
+                try:
+                    r = await http.post(path, json={"text": "%s (#%d)" % (SAMPLE_TEXT, i)})
+                    code = r.status_code
+                except httpx.HTTPError as e:
+                    code = type(e).__name__
+                latencies.append((time.perf_counter() - t0) * 1000)
+                statuses[code] = statuses.get(code, 0) + 1
+
+        t_start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        wall = time.perf_counter() - t_start
+
+    print("requests:    %d (concurrency %d)" % (total, concurrency))
+    print("statuses:    %s" % statuses)
+    print("throughput:  %.1f req/s" % (total / wall))
+    print("mean:        %.1f ms" % statistics.mean(latencies))
+    print("p50:         %.1f ms" % percentile(latencies, 50))
+    print("p90:         %.1f ms" % percentile(latencies, 90))
+    print("p99:         %.1f ms" % percentile(latencies, 99))
+    print("max:         %.1f ms" % max(latencies))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default="http://127.0.0.1:8000")
+    ap.add_argument("--path", default="/ai/parse-text")
+    ap.add_argument("-n", "--requests", type=int, default=500)
+    ap.add_argument("-c", "--concurrency", type=int, default=120)
+    args = ap.parse_args()
+    asyncio.run(run(args.url, args.requests, args.concurrency, args.path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# backend/bench/repertorize_bench.py
+# Vectorized CSR scoring vs a naive per-rubric Python loop.
+#
+#   python -m bench.repertorize_bench --rubrics 100000 --remedies 3000
+import os
+import time
+import random
+import argparse
+import tempfile
+import statistics
+
+from app.repertorize import RepertoryEngine, parse_grades
+from app.rubric_index import read_repertory
+from bench.gen_repertory import generate
+
+
+def naive_rank(table, remedies, rubric_ids, top_k):
+    totality, count = {}, {}
+    for rid in rubric_ids:
+        for remedy, grade in table[rid].items():
+            totality[remedy] = totality.get(remedy, 0) + grade
+            count[remedy] = count.get(remedy, 0) + 1
+    ranked = sorted(totality, key=lambda r: (-totality[r], -count[r]))[:top_k]
+    return [remedies[r] for r in ranked]
+
+
+def timed(fn, cases):
+    samples = []
+    for case in cases:
+        t0 = time.perf_counter()
+        fn(case)
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rubrics", type=int, default=100000)
+    ap.add_argument("--remedies", type=int, default=3000)
+    ap.add_argument("--cases", type=int, default=300)
+    ap.add_argument("--case-size", type=int, default=15)
+    ap.add_argument("--top-k", type=int, default=10)
+    args = ap.parse_args()
+
+    src = os.path.join(tempfile.mkdtemp(), "repertory.txt")
+    generate(src, args.rubrics, args.remedies)
+
+    t0 = time.perf_counter()
+    engine = RepertoryEngine.load(src)
+    build_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    engine = RepertoryEngine.load(src)
+    load_ms = (time.perf_counter() - t0) * 1000
+
+    # baseline: list of {remedy_idx: grade} dicts, the obvious pure-Python layout
+    index_of = {name: i for i, name in enumerate(engine.remedies)}
+    table = [
+        {index_of[n]: g for n, g in parse_grades(field)}
+        for _, field in read_repertory(src)
+    ]
+
+    rng = random.Random(3)
+    cases = [rng.sample(range(engine.n_rubrics), args.case_size) for _ in range(args.cases)]
+
+    mismatches = 0
+    for case in cases[:50]:
+        fast = [r["remedy"] for r in engine.rank(case, top_k=args.top_k)]
+        slow = naive_rank(table, engine.remedies, case, args.top_k)
+        mismatches += fast[:3] != slow[:3]
+
+    print("matrix:        %d rubrics x %d remedies, %d grades"
+          % (engine.grades.shape[0], engine.grades.shape[1], engine.grades.nnz))
+    print("build:         %.2f s   load: %.1f ms" % (build_s, load_ms))
+    for name, fn in (
+        ("csr score", lambda c: engine.score(c)),
+        ("csr rank", lambda c: engine.rank(c, top_k=args.top_k)),
+        ("naive loop", lambda c: naive_rank(table, engine.remedies, c, args.top_k)),
+    ):
+        p50, p99 = timed(fn, cases)
+        print("%-13s p50 %7.3f ms   p99 %7.3f ms" % (name + ":", p50, p99))
+    print("top-3 mismatches vs baseline: %d/50 (ties may order differently)" % mismatches)
+
+
+if __name__ == "__main__":
+    main()
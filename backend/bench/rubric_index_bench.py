@@ -0,0 +1,99 @@
+# backend/bench/rubric_index_bench.py
+# Build/load time, RSS and lookup latency of the rubric index.
+#
+#   python -m bench.rubric_index_bench --rubrics 100000
+import os
+import time
+import random
+import argparse
+import tempfile
+import statistics
+
+from app.rubric_index import RubricIndex, build_index
+from bench.gen_repertory import generate
+
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def timed(fn, queries, repeat: int = 1):
+    samples = []
+    for q in queries:
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            fn(q)
+        samples.append((time.perf_counter() - t0) * 1e6 / repeat)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rubrics", type=int, default=100000)
+    ap.add_argument("--queries", type=int, default=1000)
+    ap.add_argument("--repertory", help="existing repertory file instead of a synthetic one")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    src = args.repertory or os.path.join(tmp, "repertory.txt")
+    if not args.repertory:
+        generate(src, args.rubrics, 3000)
+
+    t0 = time.perf_counter()
+    build_index(src, src + ".idx")
+    build_s = time.perf_counter() - t0
+
+    rss_before = rss_mb()
+    t0 = time.perf_counter()
+    index = RubricIndex.load(src)
+    load_ms = (time.perf_counter() - t0) * 1000
+    rss_after = rss_mb()
+
+    rng = random.Random(1)
+    rids = [rng.randrange(len(index)) for _ in range(args.queries)]
+    paths = [index.path(r) for r in rids]
+    prefixes = [" > ".join(p.split(" > ")[:2]) for p in paths]
+    # LLM-style paths: dropped segment, lowercase, one typo
+    noisy = []
+    for p in paths:
+        parts = p.lower().split(" > ")
+        if len(parts) > 2:
+            parts.pop(1)
+        word = parts[-1]
+        if len(word) > 5:
+            i = rng.randrange(1, len(word) - 1)
+            word = word[:i] + word[i + 1:]
+        noisy.append(" > ".join(parts[:-1] + [word]))
+
+    snapped = sum(1 for p, r in zip(paths, rids) if index.snap(p)[0] == r)
+    noisy_hits = [index.snap(p) for p in noisy]
+    noisy_snapped = sum(1 for h, r in zip(noisy_hits, rids) if h is not None and h[0] == r)
+    noisy_rejected = sum(1 for h in noisy_hits if h is None)
+
+    print("rubrics:            %d" % len(index))
+    print("index file:         %.1f MB" % (os.path.getsize(src + ".idx") / 1e6))
+    print("build:              %.2f s" % build_s)
+    print("load (mmap):        %.2f ms" % load_ms)
+    print("RSS delta on load:  %.1f MB" % (rss_after - rss_before))
+    for name, fn, qs in (
+        ("exact", index.exact, paths),
+        ("prefix", lambda q: index.prefix(q, 20), prefixes),
+        ("snap (exact)", index.snap, paths),
+        ("snap (noisy)", index.snap, noisy),
+        ("search", lambda q: index.search(q, 10), noisy),
+    ):
+        p50, p99 = timed(fn, qs)
+        print("%-19s p50 %7.1f us   p99 %7.1f us" % (name + ":", p50, p99))
+    print("RSS after queries:  %.1f MB" % rss_mb())
+    print("exact snap accuracy: %d/%d" % (snapped, len(paths)))
+    print("noisy snap: %d/%d to the source rubric, %d rejected (dropped segment,"
+          " so the source is not always the best match)" % (noisy_snapped, len(noisy), noisy_rejected))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# backend/bench/startup_bench.py
+# Start the server as production would and measure what autoscaling feels:
+# time from spawn to /livez and /readyz, first ("cold") vs repeat ("warm")
+# latency of the main routes, and memory per process (RSS, and PSS, which
+# splits pages shared between preloaded workers fairly).
+# Needs DATABASE_URL and, for the parse route, an LLM (bench/stub_llm.py):
+#
+#   OPENAI_BASE_URL=http://127.0.0.1:9000/v1 python -m bench.startup_bench --server gunicorn -w 2
+#   python -m bench.startup_bench --server uvicorn
+import os
+import sys
+import time
+import uuid
+import signal
+import argparse
+import subprocess
+
+import httpx
+
+
+def wait_for(client, path: str, t0: float, deadline: float):
+    while time.perf_counter() < deadline:
+        try:
+            if client.get(path).status_code == 200:
+                return time.perf_counter() - t0
+        except httpx.TransportError:
+            pass
+        time.sleep(0.01)
+    return None
+
+
+def memory_kb(pid: int) -> dict:
+    out = {}
+    try:
+        with open("/proc/%d/smaps_rollup" % pid) as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("Rss", "Pss"):
+                    out[key] = int(rest.split()[0])
+    except OSError:
+        pass
+    return out
+
+
+def children(pid: int) -> list:
+    try:
+        with open("/proc/%d/task/%d/children" % (pid, pid)) as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def requests(email: str) -> list:
+    """(name, method, path, json) of the routes worth timing cold; a
+    callable json is rebuilt per call (fresh text, so the cache can't answer)."""
+    return [
+        ("login (bcrypt)", "POST", "/auth/login", {"email": email, "password": "bench-pass"}),
+        ("parse-text (LLM)", "POST", "/ai/parse-text",
+         lambda: {"text": "startup bench %s: throbbing headache at night" % uuid.uuid4().hex}),
+        ("rubrics/search", "GET", "/rubrics/search?q=head+pain+night", None),
+        ("repertorize", "POST", "/repertorize", {"rubrics": [{"rubric_id": 1}, {"rubric_id": 2}]}),
+        ("readyz", "GET", "/readyz", None),
+    ]
+
+
+def timed_call(client, method, path, body, headers=None):
+    t0 = time.perf_counter()
+    r = client.request(method, path, json=body() if callable(body) else body, headers=headers)
+    return (time.perf_counter() - t0) * 1000, r.status_code
+
+
+def run(server: str, workers: int, port: int, timeout: float, preload: bool):
+    env = dict(os.environ, PORT=str(port), PRELOAD_APP="1" if preload else "0")
+    # uvicorn reads WEB_CONCURRENCY too; keep it to a single process
+    env["WEB_CONCURRENCY"] = str(workers) if server == "gunicorn" else "1"
+    if server == "gunicorn":
+        cmd = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:app", "--log-level", "warning"]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"]
+
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, env=env)
+    try:
+        with httpx.Client(base_url="http://127.0.0.1:%d" % port, timeout=30) as client:
+            live = wait_for(client, "/livez", t0, t0 + timeout)
+            ready = wait_for(client, "/readyz", t0, t0 + timeout)
+            if server == "gunicorn":
+                print("gunicorn, %d worker(s), preload %s" % (workers, "on" if preload else "off"))
+            else:
+                print("uvicorn, 1 process")
+            print("  spawn -> /livez   %s" % ("%.0f ms" % (live * 1000) if live else "timed out"))
+            print("  spawn -> /readyz  %s" % ("%.0f ms" % (ready * 1000) if ready else "timed out"))
+            if live is None:
+                return
+
+            # one keep-alive connection, so cold and warm hit the same worker
+            email = "startup-%s@example.com" % uuid.uuid4().hex[:8]
+            client.post("/auth/signup", json={"name": "bench", "email": email, "password": "bench-pass"})
+            print("  %-18s %10s %10s" % ("route", "cold ms", "warm ms"))
+            for name, method, path, body in requests(email):
+                cold, status = timed_call(client, method, path, body)
+                warm = min(timed_call(client, method, path, body)[0] for _ in range(5))
+                print("  %-18s %10.1f %10.1f   (%d)" % (name, cold, warm, status))
+
+            pids = [proc.pid] + children(proc.pid)
+            print("  %-18s %10s %10s" % ("process", "RSS MB", "PSS MB"))
+            for i, pid in enumerate(pids):
+                mem = memory_kb(pid)
+                label = "master" if i == 0 and server == "gunicorn" else "worker %d" % pid
+                print("  %-18s %10.1f %10.1f" % (label, mem.get("Rss", 0) / 1024, mem.get("Pss", 0) / 1024))
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=30)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--server", choices=("gunicorn", "uvicorn"), default="gunicorn")
+    ap.add_argument("-w", "--workers", type=int, default=2)
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--timeout", type=float, default=60)
+    ap.add_argument("--no-preload", action="store_true", help="gunicorn: import the app in each worker")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import app.main"], check=True)
+    print("import app.main: %.0f ms" % ((time.perf_counter() - t0) * 1000))
+    run(args.server, args.workers, args.port, args.timeout, not args.no_preload)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# backend/bench/stream_ttfr.py
+# Compare time-to-first-rubric of the streaming parse with the blocking one.
+# Runs in-process against bench/stub_llm.py, so no database is needed. For a
+# fair comparison give the blocking stub the same total generation time
+# (TTFT + chunks * STUB_TOKEN_MS, ~1.5 s with the defaults):
+#
+#   STUB_LATENCY_MS=1500 STUB_JITTER_MS=0 uvicorn bench.stub_llm:app --port 9000
+#   OPENAI_BASE_URL=http://127.0.0.1:9000/v1 OPENAI_API_KEY=stub python -m bench.stream_ttfr -n 50
+import time
+import asyncio
+import argparse
+import statistics
+
+from app import ai
+from app.cache import response_cache
+
+
+async def run(total: int):
+    first_rubric, streamed_done, blocking = [], [], []
+    for i in range(total):
+        text = "throbbing headache at night, case %d" % i
+
+        t0 = time.perf_counter()
+        seen = False
+        async for event, _ in ai.parse_text_stream(text):
+            if event == "rubric" and not seen:
+                first_rubric.append((time.perf_counter() - t0) * 1000)
+                seen = True
+        streamed_done.append((time.perf_counter() - t0) * 1000)
+
+        response_cache.clear()
+        t0 = time.perf_counter()
+        await ai.parse_text_async(text)
+        blocking.append((time.perf_counter() - t0) * 1000)
+        response_cache.clear()
+
+    await ai.close_async_client()
+    print("runs:                      %d" % total)
+    print("stream first rubric p50:   %.1f ms" % statistics.median(first_rubric))
+    print("stream complete p50:       %.1f ms" % statistics.median(streamed_done))
+    print("blocking parse p50:        %.1f ms" % statistics.median(blocking))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", "--requests", type=int, default=20)
+    args = ap.parse_args()
+    asyncio.run(run(args.requests))
+
+
+if __name__ == "__main__":
+    main()
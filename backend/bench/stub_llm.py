@@ -0,0 +1,108 @@
+# backend/bench/stub_llm.py
+# Minimal OpenAI-compatible chat completions server for offline benchmarking.
+#
+#   STUB_LATENCY_MS=800 uvicorn bench.stub_llm:app --port 9000
+#   OPENAI_BASE_URL=http://127.0.0.1:9000/v1 uvicorn app.main:app --port 8000
+import os
+import json
+import time
+import random
+import re
+import asyncio
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+
+STUB_LATENCY_MS = float(os.environ.get("STUB_LATENCY_MS", "500"))
+STUB_JITTER_MS = float(os.environ.get("STUB_JITTER_MS", "200"))
+# fraction of requests answered with a 503 to exercise retries
+STUB_ERROR_RATE = float(os.environ.get("STUB_ERROR_RATE", "0"))
+# streaming: delay before the first token, then per chunk of STUB_CHUNK_CHARS
+STUB_TTFT_MS = float(os.environ.get("STUB_TTFT_MS", "200"))
+STUB_TOKEN_MS = float(os.environ.get("STUB_TOKEN_MS", "15"))
+STUB_CHUNK_CHARS = int(os.environ.get("STUB_CHUNK_CHARS", "4"))
+
+CANNED = {
+    "summary": "Throbbing headache, worse at night, with irritability.",
+    "risk": "low",
+    "rubrics": [
+        {"path": "Head > Pain > Night", "confidence": 0.82, "evidence": "headache at night"},
+        {"path": "Head > Pain > Throbbing", "confidence": 0.74, "evidence": "throbbing"},
+        {"path": "Mind > Irritability", "confidence": 0.61, "evidence": "irritable"},
+    ],
+}
+
+app = FastAPI(title="Stub LLM")
+
+
+def _answer(body: dict) -> str:
+    messages = body.get("messages", [])
+    system = next((m.get("content") or "" for m in messages if m.get("role") == "system"), "")
+    if '"results"' in system:
+        # packed batch prompt: one canned result per "[i]" case marker
+        user = next((m.get("content") or "" for m in messages if m.get("role") == "user"), "")
+        indexes = [int(i) for i in re.findall(r"^\[(\d+)\]", user, re.M)]
+        return json.dumps({"results": [dict(CANNED, index=i) for i in indexes]})
+    return json.dumps(CANNED)
+
+
+def _chunk(model: str, delta: dict, finish_reason=None):
+    return "data: %s\n\n" % json.dumps({
+        "id": "stub-stream",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    })
+
+
+async def _stream(model: str, content: str):
+    await asyncio.sleep(STUB_TTFT_MS / 1000)
+    yield _chunk(model, {"role": "assistant", "content": ""})
+    for i in range(0, len(content), STUB_CHUNK_CHARS):
+        yield _chunk(model, {"content": content[i:i + STUB_CHUNK_CHARS]})
+        await asyncio.sleep(STUB_TOKEN_MS / 1000)
+    yield _chunk(model, {}, "stop")
+    yield "data: [DONE]\n\n"
+
+
+@app.get("/v1/models/{model}")
+async def retrieve_model(model: str):
+    # what the readiness probe calls
+    return {"id": model, "object": "model", "created": 0, "owned_by": "stub"}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(body: dict):
+    if body.get("stream"):
+        return StreamingResponse(
+            _stream(body.get("model", "stub"), _answer(body)),
+            media_type="text/event-stream",
+        )
+
+    delay = STUB_LATENCY_MS + random.uniform(-STUB_JITTER_MS, STUB_JITTER_MS)
+    await asyncio.sleep(max(delay, 0) / 1000)
+
+    if STUB_ERROR_RATE and random.random() < STUB_ERROR_RATE:
+        raise HTTPException(status_code=503, detail="stub overloaded")
+
+    content = _answer(body)
+    prompt_chars = sum(len(m.get("content") or "") for m in body.get("messages", []))
+    return {
+        "id": "stub-%d" % random.randint(0, 1 << 30),
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {
+            "prompt_tokens": prompt_chars // 4,
+            "completion_tokens": len(content) // 4,
+            "total_tokens": (prompt_chars + len(content)) // 4,
+        },
+    }
@@ -0,0 +1,71 @@
+# backend/gunicorn.conf.py
+# Production serving: gunicorn master + uvicorn workers.
+#
+#   gunicorn -c gunicorn.conf.py app.main:app
+#
+# Every setting below can be overridden from the environment.
+import os
+
+
+def available_cpus() -> int:
+    """CPUs this process may actually use: affinity mask, then the cgroup v2
+    quota (a container limited to 2 CPUs on a 64-core host counts as 2)."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+
+CPUS = available_cpus()
+
+bind = "0.0.0.0:%s" % os.environ.get("PORT", "8000")
+worker_class = "uvicorn.workers.UvicornWorker"
+# async workers: one per CPU is enough to keep every core busy (2n+1 is for
+# sync workers); each worker holds its own DB pool and LLM client
+workers = int(os.environ.get("WEB_CONCURRENCY", str(min(CPUS, int(os.environ.get("MAX_WORKERS", "8"))))))
+
+# import the app (and, via warm_up, the repertory files) once in the master;
+# workers fork from it, start in milliseconds and share those pages
+preload_app = os.environ.get("PRELOAD_APP", "1").lower() in ("1", "true", "yes")
+
+timeout = int(os.environ.get("WORKER_TIMEOUT", "60"))
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.environ.get("KEEPALIVE", "5"))
+# recycling bounds memory growth, but a recycled worker cancels its batch
+# jobs and they only resume on the next full restart, so it is off by default
+max_requests = int(os.environ.get("MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.environ.get("MAX_REQUESTS_JITTER", "0"))
+loglevel = os.environ.get("LOG_LEVEL", "info")
+
+# bcrypt threads per worker: split the CPUs between workers instead of
+# every worker starting min(4, CPUs) threads
+os.environ.setdefault("PASSWORD_HASH_WORKERS", str(max(1, CPUS // max(workers, 1))))
+# the app claims orphaned batch jobs (at startup, then periodically); only
+# the first worker does, and none when the operator set RESUME_JOBS=0
+RESUME_JOBS = os.environ.get("RESUME_JOBS", "1") != "0"
+os.environ["RESUME_JOBS"] = "0"
+
+
+def when_ready(server):
+    if preload_app:
+        from app.main import warm_up
+        warm_up()
+
+
+def pre_fork(server, worker):
+    # runs in the master, so this flag survives between forks
+    worker.resume_jobs = not getattr(server, "resume_jobs_assigned", False)
+    server.resume_jobs_assigned = True
+
+
+def post_fork(server, worker):
+    if RESUME_JOBS and worker.resume_jobs:
+        os.environ["RESUME_JOBS"] = "1"
@@ -0,0 +1,54 @@
+# backend/tests/conftest.py
+import json
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app import ai
+from app.cache import ResponseCache
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    """A fresh in-process response cache (no DB tier) in place of ai's."""
+    cache = ResponseCache(use_db=False)
+    monkeypatch.setattr(ai, "response_cache", cache)
+    return cache
+
+
+class FakeLLM:
+    """Stands in for the AsyncOpenAI client. chat.completions.create plays
+    `script` in order (a string is the reply, an exception is raised) and
+    then keeps repeating its last entry; `gate`, when set, holds every call
+    until it is opened."""
+
+    def __init__(self):
+        self.script = [json.dumps({"summary": "s", "risk": "low", "rubrics": []})]
+        self.calls = 0
+        self.delay = 0.0
+        self.gate: asyncio.Event | None = None
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, model, messages, temperature, **kwargs):
+        self.calls += 1
+        step = self.script[min(self.calls, len(self.script)) - 1]
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if isinstance(step, Exception):
+            raise step
+        message = SimpleNamespace(content=step)
+        return SimpleNamespace(usage=None, choices=[SimpleNamespace(message=message)])
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    """A FakeLLM behind ai.chat_completion, with a fresh concurrency
+    semaphore and no retry backoff."""
+    fake = FakeLLM()
+    monkeypatch.setattr(ai, "get_async_client", lambda: fake)
+    monkeypatch.setattr(ai, "_semaphore", asyncio.Semaphore(ai.LLM_MAX_CONCURRENCY))
+    monkeypatch.setattr(ai, "LLM_BACKOFF_BASE", 0.0)
+    return fake
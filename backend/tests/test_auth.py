@@ -0,0 +1,37 @@
+# backend/tests/test_auth.py
+import asyncio
+
+from app import auth
+
+
+def test_tokens_round_trip_and_bad_ones_are_rejected():
+    token = auth.create_access_token("a@example.com", user_id=7)
+    claims = auth.decode_access_claims(token)
+    assert claims["sub"] == "a@example.com" and claims["uid"] == 7
+    assert auth.decode_access_claims(token[:-2] + "xx") is None
+    assert asyncio.run(auth.user_id_for(claims)) == 7
+
+
+def test_user_id_lookups_are_bounded_and_expire(monkeypatch):
+    lookups = []
+
+    async def fetch_one(query):
+        email = query.compile().params["email_1"]
+        lookups.append(email)
+        return {"id": int(email.split("@")[0])}
+
+    monkeypatch.setattr(auth.database, "fetch_one", fetch_one)
+    monkeypatch.setattr(auth, "_user_ids", auth.OrderedDict())
+    monkeypatch.setattr(auth, "USER_ID_CACHE_SIZE", 2)
+
+    def user_id(email):
+        return asyncio.run(auth.user_id_for({"sub": email, "uid": None}))
+
+    assert [user_id("1@x"), user_id("1@x"), user_id("2@x"), user_id("3@x")] == [1, 1, 2, 3]
+    assert lookups == ["1@x", "2@x", "3@x"]
+    assert list(auth._user_ids) == ["2@x", "3@x"]
+
+    monkeypatch.setattr(auth, "USER_ID_CACHE_TTL", -1)
+    user_id("4@x")
+    user_id("4@x")
+    assert lookups[-2:] == ["4@x", "4@x"]
@@ -0,0 +1,81 @@
+# backend/tests/test_batch.py
+import json
+import asyncio
+
+import pytest
+
+from app import ai, batch
+
+RESULT = {"summary": "s", "risk": "low", "rubrics": []}
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    async def completion(messages, temperature, max_tokens=None, background=False):
+        system, user = messages[0]["content"], messages[1]["content"]
+        if system == ai.PACKED_SYSTEM_PROMPT:
+            calls.append("packed")
+            n = user.count("\n\n") + 1
+            return json.dumps({"results": [dict(RESULT, index=i) for i in range(n)]})
+        calls.append("single")
+        return json.dumps(RESULT)
+
+    monkeypatch.setattr(ai, "chat_completion", completion)
+    return calls
+
+
+async def collect(texts, pack):
+    return sorted([item async for item in batch.run_batch(texts, pack)], key=lambda i: i["index"])
+
+
+def test_packed_results_are_cached_under_their_own_key(cache, calls):
+    texts = ["headache at night", "fear of the dark"]
+    first = asyncio.run(collect(texts, pack=True))
+    assert calls == ["packed"]
+    assert all(item["result"]["summary"] == "s" for item in first)
+    assert cache.get(ai.packed_cache_key(texts[0])) is not None
+    assert cache.get(ai.parse_cache_key(texts[0])) is None
+
+    # a later batch reuses them, with or without packing
+    assert asyncio.run(collect(texts, pack=False)) == first
+    assert calls == ["packed"]
+
+    # a single parse uses its own prompt, so it never gets a packed answer
+    asyncio.run(ai.parse_text_strict(texts[0]))
+    assert calls == ["packed", "single"]
+
+
+def test_batch_reads_the_db_tier(cache, calls, monkeypatch):
+    rows = {ai.parse_cache_key("headache at night"): json.dumps(RESULT)}
+
+    async def db_get(key):
+        return rows.get(key)
+
+    monkeypatch.setattr(cache, "_db_get", db_get)
+    items = asyncio.run(collect(["headache at night"], pack=False))
+    assert items[0]["result"]["summary"] == "s"
+    assert calls == []
+    assert cache.stats["db_hits"] == 1
+
+
+def test_a_full_llm_queue_delays_batch_items_instead_of_failing_them(cache, llm, monkeypatch):
+    llm.script = [json.dumps(RESULT)]
+    llm.delay = 0.001
+    monkeypatch.setattr(ai, "LLM_MAX_QUEUE", 4)
+    monkeypatch.setattr(batch, "BATCH_BUSY_RETRY_DELAY", 0.001)
+
+    async def scenario():
+        monkeypatch.setattr(ai, "_semaphore", asyncio.Semaphore(2))
+        texts = ["case %d" % i for i in range(40)]
+        # interactive parses of the same texts, some of them turned away
+        interactive = [asyncio.ensure_future(ai.parse_text_strict(t)) for t in texts[:20]]
+        items = await collect(texts, pack=False)
+        busy = await asyncio.gather(*interactive, return_exceptions=True)
+        return items, busy
+
+    items, busy = asyncio.run(scenario())
+    assert any(isinstance(r, ai.LLMBusyError) for r in busy)
+    assert [i["index"] for i in items] == list(range(40))
+    assert all("result" in i for i in items)
@@ -0,0 +1,122 @@
+# backend/tests/test_cache.py
+import asyncio
+
+from app.cache import ResponseCache
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_callers_share_one_computation():
+    async def scenario():
+        cache = ResponseCache(use_db=False)
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"summary": "x"}
+
+        results = await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(5)))
+        assert results == [{"summary": "x"}] * 5
+        assert len(calls) == 1
+        assert cache.stats["coalesced"] == 4
+        assert await cache.get_or_compute("k", compute) == {"summary": "x"}
+        assert cache.stats["hits"] == 1
+
+    run(scenario())
+
+
+def test_cancelled_starter_does_not_cancel_waiters():
+    async def scenario():
+        cache = ResponseCache(use_db=False)
+        release = asyncio.Event()
+
+        async def compute():
+            await release.wait()
+            return {"summary": "x"}
+
+        starter = asyncio.create_task(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0)
+
+        starter.cancel()
+        await asyncio.gather(starter, return_exceptions=True)
+        assert starter.cancelled()
+
+        release.set()
+        assert await waiter == {"summary": "x"}
+        assert cache.get("k") == {"summary": "x"}
+
+    run(scenario())
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    async def scenario():
+        cache = ResponseCache(use_db=False)
+
+        async def compute():
+            await asyncio.sleep(0.01)
+            raise ValueError("bad json")
+
+        results = await asyncio.gather(
+            *(cache.get_or_compute("k", compute) for _ in range(3)), return_exceptions=True
+        )
+        assert all(isinstance(r, ValueError) for r in results)
+        assert cache.get("k") is None
+        assert "k" not in cache._inflight
+
+    run(scenario())
+
+
+def test_cancelled_computation_lets_waiters_retry():
+    async def scenario():
+        cache = ResponseCache(use_db=False)
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"n": len(calls)}
+
+        waiter = asyncio.create_task(cache.get_or_compute("k", compute))
+        while not calls:
+            await asyncio.sleep(0)
+        # e.g. shutdown cancelling the computation task itself
+        cache._inflight["k"].cancel()
+        assert await waiter == {"n": 2}
+
+    run(scenario())
+
+
+def test_claimed_key_makes_lookups_wait_for_store():
+    async def scenario():
+        cache = ResponseCache(use_db=False)
+        assert cache.claim("k")
+        assert not cache.claim("k")
+        waiter = asyncio.create_task(cache.lookup("k"))
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        await cache.store("k", {"summary": "x"})
+        assert await waiter == {"summary": "x"}
+        assert "k" not in cache._inflight
+
+    run(scenario())
+
+
+def test_abandoned_claim_lets_waiters_compute():
+    async def scenario():
+        cache = ResponseCache(use_db=False)
+        cache.claim("k")
+
+        async def compute():
+            return {"summary": "own"}
+
+        waiter = asyncio.create_task(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0)
+        cache.abandon("k")
+        assert await waiter == {"summary": "own"}
+
+    run(scenario())
@@ -0,0 +1,78 @@
+# backend/tests/test_cases.py
+import json
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import ai, cases
+from app.main import app, current_practitioner
+from app.schemas import CaseIn
+
+
+@pytest.fixture
+def client():
+    app.dependency_overrides[current_practitioner] = lambda: 1
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def test_cursor_round_trip():
+    stamp = datetime(2024, 5, 1, 12, 30, 15, 123456)
+    cursor = cases.encode_cursor(stamp, 42)
+    assert "=" not in cursor
+    assert cases.decode_cursor(cursor) == (stamp, 42)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-base64!", "bm9waXBl", cases.encode_cursor(datetime(2024, 1, 1), 1)[:-3]])
+def test_malformed_cursor_is_a_value_error(cursor):
+    with pytest.raises(ValueError):
+        cases.decode_cursor(cursor)
+
+
+def test_malformed_cursor_is_a_400(client):
+    r = client.get("/cases", params={"cursor": "bm9waXBl"})
+    assert r.status_code == 400
+    assert r.json()["detail"] == "invalid cursor"
+
+
+def test_rubric_path_longer_than_its_column_is_a_422(client):
+    r = client.put("/cases/1/rubrics", json={"rubrics": [{"path": "x" * 501}]})
+    assert r.status_code == 422
+
+
+def test_bulk_values_keep_the_last_of_a_repeated_client_ref():
+    items = [
+        CaseIn(client_ref="a", patient_name="first a"),
+        CaseIn(patient_name="no ref 1"),
+        CaseIn(client_ref="b", patient_name="b"),
+        CaseIn(client_ref="a", patient_name="second a"),
+        CaseIn(patient_name="no ref 2"),
+    ]
+    now = datetime(2024, 1, 1)
+    values = cases.bulk_values(7, items, now)
+    assert [(v["client_ref"], v["patient_name"]) for v in values] == [
+        (None, "no ref 1"), ("b", "b"), ("a", "second a"), (None, "no ref 2"),
+    ]
+    assert all(v["practitioner_id"] == 7 and v["updated_at"] == now for v in values)
+
+
+def row(text, parse_key, result={"summary": "s"}):
+    return {"text": text, "parse_key": parse_key, "parse_result": json.dumps(result) if result else None}
+
+
+def test_stored_parse_is_used_while_the_text_is_unchanged():
+    text = "headache at night"
+    assert cases.stored_parse(row(text, ai.parse_cache_key(text))) == {"summary": "s"}
+    # same key after whitespace normalization
+    assert cases.stored_parse(row("headache  at night ", ai.parse_cache_key(text))) == {"summary": "s"}
+
+
+def test_stored_parse_is_stale_after_an_edit_or_a_model_change(monkeypatch):
+    text = "headache at night"
+    key = ai.parse_cache_key(text)
+    assert cases.stored_parse(row("headache in the morning", key)) is None
+    assert cases.stored_parse(row(text, None)) is None
+    assert cases.stored_parse(row(text, key, result=None)) is None
+    monkeypatch.setattr(ai, "LLM_MODEL", "another-model")
+    assert cases.stored_parse(row(text, key)) is None
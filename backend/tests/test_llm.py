@@ -0,0 +1,91 @@
+# backend/tests/test_llm.py
+import json
+import asyncio
+
+import httpx
+import openai
+import pytest
+from fastapi.testclient import TestClient
+
+from app import ai
+from app.main import app
+
+MESSAGES = [{"role": "user", "content": "headache"}]
+REQUEST = httpx.Request("POST", "http://llm.test/v1/chat/completions")
+
+
+def complete(**kwargs):
+    return ai.chat_completion(MESSAGES, temperature=0.1, **kwargs)
+
+
+def test_queue_full_raises_busy(llm, monkeypatch):
+    monkeypatch.setattr(ai, "_semaphore", asyncio.Semaphore(1))
+    monkeypatch.setattr(ai, "LLM_MAX_QUEUE", 1)
+
+    async def scenario():
+        llm.gate = asyncio.Event()
+        running = asyncio.ensure_future(complete())   # holds the only slot
+        queued = asyncio.ensure_future(complete())    # the one allowed waiter
+        await asyncio.sleep(0)
+        assert ai.llm_queue_depth() == 1
+        with pytest.raises(ai.LLMBusyError):
+            await complete()
+        # batch work is never turned away, it waits behind the queue
+        background = asyncio.ensure_future(complete(background=True))
+        await asyncio.sleep(0)
+        assert ai.llm_queue_depth() == 2
+        llm.gate.set()
+        await asyncio.gather(running, queued, background)
+
+    asyncio.run(scenario())
+    assert llm.calls == 3
+    assert ai._semaphore._value == 1 and ai.llm_queue_depth() == 0
+
+
+def test_queue_full_is_a_429(cache, llm, monkeypatch):
+    monkeypatch.setattr(ai, "_semaphore", asyncio.Semaphore(0))
+    monkeypatch.setattr(ai, "LLM_MAX_QUEUE", 0)
+    r = TestClient(app).post("/ai/parse-text", json={"text": "headache at night"})
+    assert r.status_code == 429
+    assert r.headers["retry-after"] == "1"
+    assert llm.calls == 0
+
+
+def test_retryable_errors_are_retried(llm, monkeypatch):
+    monkeypatch.setattr(ai, "LLM_MAX_RETRIES", 2)
+    llm.script = [openai.APIConnectionError(request=REQUEST), openai.APITimeoutError(REQUEST), '{"ok": 1}']
+    assert asyncio.run(complete()) == '{"ok": 1}'
+    assert llm.calls == 3
+
+
+def test_gives_up_after_max_retries(llm, monkeypatch):
+    monkeypatch.setattr(ai, "LLM_MAX_RETRIES", 2)
+    llm.script = [openai.APITimeoutError(REQUEST)]
+    with pytest.raises(openai.APITimeoutError):
+        asyncio.run(complete())
+    assert llm.calls == 3
+    assert ai._semaphore._value == ai.LLM_MAX_CONCURRENCY
+
+
+@pytest.mark.parametrize("error", [
+    openai.AuthenticationError("bad key", response=httpx.Response(401, request=REQUEST), body=None),
+    openai.BadRequestError("bad request", response=httpx.Response(400, request=REQUEST), body=None),
+    ValueError("not an API error"),
+])
+def test_other_errors_fail_fast(llm, error):
+    llm.script = [error]
+    with pytest.raises(type(error)):
+        asyncio.run(complete())
+    assert llm.calls == 1
+    assert ai._semaphore._value == ai.LLM_MAX_CONCURRENCY
+
+
+def test_parse_falls_back_when_the_llm_keeps_failing(cache, llm, monkeypatch):
+    monkeypatch.setattr(ai, "LLM_MAX_RETRIES", 1)
+    llm.script = [openai.InternalServerError("down", response=httpx.Response(500, request=REQUEST), body=None)]
+    result = asyncio.run(ai.parse_text_async("headache at night"))
+    assert llm.calls == 2
+    assert set(result) >= {"summary", "risk", "rubrics"}
+    # the fallback is not cached: the next request asks the model again
+    llm.script = [json.dumps({"summary": "real", "risk": "low", "rubrics": []})]
+    assert asyncio.run(ai.parse_text_async("headache at night"))["summary"] == "real"
@@ -0,0 +1,88 @@
+# backend/tests/test_metrics.py
+import asyncio
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app import metrics
+from app.models import cases, case_rubrics, parse_jobs
+
+
+def test_histogram_render_is_cumulative():
+    h = metrics.Histogram("test_latency_seconds", "test", ("route",), buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        h.observe(value, "/a")
+    h.observe(0.2, '/b"q"')
+    assert list(h.render()) == [
+        "# HELP test_latency_seconds test",
+        "# TYPE test_latency_seconds histogram",
+        'test_latency_seconds_bucket{route="/a",le="0.1"} 2',
+        'test_latency_seconds_bucket{route="/a",le="1"} 3',
+        'test_latency_seconds_bucket{route="/a",le="+Inf"} 4',
+        'test_latency_seconds_sum{route="/a"} 3.65',
+        'test_latency_seconds_count{route="/a"} 4',
+        'test_latency_seconds_bucket{route="/b\\"q\\"",le="0.1"} 0',
+        'test_latency_seconds_bucket{route="/b\\"q\\"",le="1"} 1',
+        'test_latency_seconds_bucket{route="/b\\"q\\"",le="+Inf"} 1',
+        'test_latency_seconds_sum{route="/b\\"q\\""} 0.2',
+        'test_latency_seconds_count{route="/b\\"q\\""} 1',
+    ]
+
+
+def test_counter_render():
+    c = metrics.Counter("test_things_total", "test", ("kind",))
+    c.inc("a")
+    c.inc("a", amount=2)
+    c.inc("b", amount=0.5)
+    assert list(c.render())[2:] == ['test_things_total{kind="a"} 3', 'test_things_total{kind="b"} 0.5']
+
+
+def test_middleware_labels_by_route_template():
+    app = FastAPI()
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/things/{thing_id}")
+    async def thing(thing_id: int):
+        if thing_id == 0:
+            raise HTTPException(status_code=404)
+        return {"id": thing_id}
+
+    def counts():
+        return {key: sum(row[:-1]) for key, row in metrics.http_latency._values.items()}
+
+    before = counts()
+    client = TestClient(app)
+    for path in ("/things/1", "/things/2", "/things/0", "/nowhere/3"):
+        client.get(path)
+    new = {key: n - before.get(key, 0) for key, n in counts().items()}
+
+    assert new[("GET", "/things/{thing_id}", "200")] == 2
+    assert new[("GET", "/things/{thing_id}", "404")] == 1
+    assert new[("GET", "unmatched", "404")] == 1
+    assert not any(route in ("/things/1", "/things/2", "/nowhere/3") for _, route, _ in new)
+
+
+def test_instrument_database_names_tables():
+    class FakeDatabase:
+        async def execute(self, query, values=None):
+            return 1
+        execute_many = fetch_one = fetch_all = fetch_val = execute
+
+    db = metrics.instrument_database(FakeDatabase())
+    assert metrics.instrument_database(db) is db  # wrapping twice is a no-op
+
+    async def queries():
+        await db.execute(parse_jobs.insert())
+        await db.fetch_all(select(cases.c.id, case_rubrics.c.path).where(cases.c.id == case_rubrics.c.case_id))
+        await db.fetch_one(select(cases).join(case_rubrics, cases.c.id == case_rubrics.c.case_id))
+        await db.fetch_val("SELECT 1")
+
+    before = set(metrics.db_latency._values)
+    asyncio.run(queries())
+    assert set(metrics.db_latency._values) - before >= {
+        ("execute", "parse_jobs"),
+        ("fetch_all", "cases,case_rubrics"),
+        ("fetch_one", "cases,case_rubrics"),
+        ("fetch_val", "raw"),
+    }
@@ -0,0 +1,67 @@
+# backend/tests/test_parse_stream.py
+import json
+import asyncio
+
+from app import ai
+
+PAYLOAD = {
+    "summary": "Throbbing headache, worse at night",
+    "risk": "low",
+    "rubrics": [{"path": "Head > Pain > Night", "confidence": 0.8, "evidence": "at night"}],
+}
+
+
+def fake_completion(text: str, fail_after: int | None = None, calls: list | None = None):
+    async def stream(messages, temperature):
+        if calls is not None:
+            calls.append(1)
+        for i in range(0, len(text), 5):
+            if fail_after is not None and i >= fail_after:
+                raise ConnectionError("upstream reset")
+            await asyncio.sleep(0)
+            yield text[i:i + 5]
+    return stream
+
+
+async def collect(text: str):
+    return [event async for event in ai.parse_text_stream(text)]
+
+
+def test_stream_is_cached_and_replayed(cache, monkeypatch):
+    calls = []
+    monkeypatch.setattr(ai, "chat_completion_stream", fake_completion(json.dumps(PAYLOAD), calls=calls))
+
+    first = asyncio.run(collect("headache at night"))
+    second = asyncio.run(collect("headache  at night"))
+    assert [e for e, _ in first] == ["summary", "risk", "rubric", "done"]
+    assert [e for e, _ in second] == [e for e, _ in first]
+    assert len(calls) == 1
+    assert cache.stats["misses"] == 1 and cache.stats["hits"] == 1
+
+
+def test_identical_concurrent_streams_share_one_completion(cache, monkeypatch):
+    calls = []
+    monkeypatch.setattr(ai, "chat_completion_stream", fake_completion(json.dumps(PAYLOAD), calls=calls))
+
+    async def scenario():
+        return await asyncio.gather(*(collect("headache at night") for _ in range(3)))
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(r[-1][1]["summary"] == PAYLOAD["summary"] for r in results)
+
+
+def test_failure_after_summary_does_not_resend_it(cache, monkeypatch):
+    text = json.dumps(PAYLOAD)
+    monkeypatch.setattr(ai, "chat_completion_stream", fake_completion(text, fail_after=text.index("rubrics")))
+
+    events = asyncio.run(collect("headache at night"))
+    names = [e for e, _ in events]
+    assert names.count("summary") == 1 and names.count("risk") == 1
+    assert dict(events)["summary"] == PAYLOAD["summary"]
+    assert "rubric" in names
+    done = events[-1][1]
+    assert done["summary"] == PAYLOAD["summary"] and done["rubrics"]
+    # fallbacks are not cached, and the claim was released
+    assert cache.get(ai.parse_cache_key("headache at night")) is None
+    assert not cache._inflight
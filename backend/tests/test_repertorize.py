@@ -0,0 +1,82 @@
+# backend/tests/test_repertorize.py
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from app.repertorize import RepertoryEngine, build_matrix, parse_grades
+
+REPERTORY = """\
+Head > Pain\tbell:3 nux-v:2 glon:1
+Head > Pain > Night\tbell:2 ars:3
+Mind > Fear\tacon:3 ars:2
+Mind > Irritability\tnux-v:3 cham:3 bell:1
+Fever > Heat\tbell:3 acon:2
+Empty rubric\t
+"""
+
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    src = tmp_path_factory.mktemp("rep") / "repertory.txt"
+    src.write_text(REPERTORY)
+    return RepertoryEngine.load(str(src))
+
+
+def naive(engine, rubric_ids, weights):
+    table = [dict(parse_grades(line.partition("\t")[2])) for line in REPERTORY.splitlines()]
+    n = len(engine.remedies)
+    totality, weighted, count = np.zeros(n), np.zeros(n), np.zeros(n)
+    for rid, w in zip(rubric_ids, weights):
+        for name, grade in table[rid].items():
+            col = engine.remedies.index(name)
+            totality[col] += grade
+            weighted[col] += grade * w
+            count[col] += 1
+    return totality, weighted, count
+
+
+def test_score_matches_a_plain_loop(engine):
+    ids, weights = [0, 1, 3, 4, 5], [1.0, 2.0, 0.5, 1.5, 3.0]
+    for got, want in zip(engine.score(ids, weights), naive(engine, ids, weights)):
+        assert np.allclose(got, want)
+
+
+def test_repeated_rubrics_count_once_with_their_highest_weight(engine):
+    once = engine.score([0, 4], [2.0, 1.0])
+    repeated = engine.score([0, 4, 0, 0], [1.0, 1.0, 2.0, 0.5])
+    for got, want in zip(repeated, once):
+        assert np.array_equal(got, want)
+    top = engine.rank([0, 0, 4], method="count", top_k=1)[0]
+    assert top["remedy"] == "bell" and top["rubric_count"] == 2 and top["percentage"] == 100
+
+
+def test_rank(engine):
+    results = engine.rank([0, 1, 3, 4], top_k=3)
+    assert [r["remedy"] for r in results] == ["bell", "nux-v", "ars"]
+    assert results[0] == {
+        "remedy": "bell", "score": 9.0, "percentage": 75, "totality": 9, "weighted": 9.0,
+        "rubric_count": 4,
+        "matched_rubrics": [
+            {"rubric_id": 0, "grade": 3}, {"rubric_id": 1, "grade": 2},
+            {"rubric_id": 3, "grade": 1}, {"rubric_id": 4, "grade": 3},
+        ],
+    }
+
+
+def test_rank_edge_cases(engine):
+    assert engine.rank([]) == []
+    assert engine.rank([5]) == []
+    with pytest.raises(ValueError):
+        engine.rank([0], method="bogus")
+
+
+def test_concurrent_builds_do_not_share_a_temp_file(tmp_path):
+    src = tmp_path / "repertory.txt"
+    src.write_text(REPERTORY)
+    out = str(tmp_path / "repertory.txt.grades.npz")
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(lambda _: build_matrix(str(src), out), range(8)))
+    assert sorted(os.listdir(tmp_path)) == ["repertory.txt", "repertory.txt.grades.npz"]
+    assert RepertoryEngine.load(str(src)).n_rubrics == 6
@@ -0,0 +1,71 @@
+# backend/tests/test_rubric_index.py
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.rubric_index import RubricIndex, RUBRIC_SNAP_MIN_SCORE, build_index
+
+REPERTORY = """\
+# tiny repertory
+Head > Pain\tbell:3 nux-v:2
+Head > Pain > Night\tbell:2
+Head > Pain > Throbbing\tbell:3 glon:3
+Mind > Fear\tacon:3 ars:2
+Mind > Fear > Death\tacon:3
+Mind > Irritability\tnux-v:3 cham:3
+Mind > Anxiety > Evening\tars:2 calc:2
+Fever > Heat\tbell:3 acon:2
+Chest > Palpitation\tacon:2 cact:3
+Stomach > Nausea > After eating\tnux-v:3 puls:2
+Sleep > Sleeplessness > Midnight\tars:3
+"""
+
+
+@pytest.fixture(scope="module")
+def index(tmp_path_factory):
+    src = tmp_path_factory.mktemp("rep") / "repertory.txt"
+    src.write_text(REPERTORY)
+    return RubricIndex.load(str(src))
+
+
+def test_exact_and_prefix(index):
+    assert index.snap("head > pain > night") == (1, "Head > Pain > Night", 1.0)
+    assert [p for _, p in index.prefix("Mind > Fear")] == ["Mind > Fear", "Mind > Fear > Death"]
+
+
+def test_typo_snaps_but_scores_below_exact(index):
+    rid, path, score = index.snap("Stomach > Nausea > After eatng")
+    assert path == "Stomach > Nausea > After eating"
+    assert RUBRIC_SNAP_MIN_SCORE <= score < 1.0
+
+
+@pytest.mark.parametrize("query", [
+    "Head > Pain > Banana smoothie",
+    "Heart > Palpitations > Anxiety",
+])
+def test_unknown_words_count_against_the_match(index, query):
+    assert index.snap(query) is None
+    hits = index.search(query, 1)
+    assert not hits or hits[0][2] < RUBRIC_SNAP_MIN_SCORE
+
+
+def test_unknown_word_lowers_the_score(index):
+    full = index.search("Mind > Fear > Death", 1)[0]
+    partial = index.search("Mind > Fear > Dark", 1)[0]
+    assert partial[1] == "Mind > Fear" and partial[2] < full[2] == 1.0
+
+
+def test_extract_ignores_words_no_rubric_uses(index):
+    rubrics = index.extract("Patient reports throbbing head pain, better with a banana smoothie")
+    assert rubrics[0]["path"] == "Head > Pain > Throbbing"
+
+
+def test_concurrent_builds_do_not_share_a_temp_file(tmp_path):
+    src = tmp_path / "repertory.txt"
+    src.write_text(REPERTORY)
+    out = str(tmp_path / "repertory.txt.idx")
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(lambda _: build_index(str(src), out), range(8)))
+    assert sorted(os.listdir(tmp_path)) == ["repertory.txt", "repertory.txt.idx"]
+    assert len(RubricIndex(out)) == 11
@@ -0,0 +1,139 @@
+# backend/tests/test_streaming.py
+import json
+
+import pytest
+
+from app.streaming import IncrementalRubricParser, sse_event
+
+PAYLOAD = {
+    "summary": "Throbbing headache, worse at night",
+    "risk": "low",
+    "rubrics": [
+        {"path": "Head > Pain > Night", "confidence": 0.8, "evidence": "at night"},
+        {"path": "Mind > Irritability", "confidence": 0.6, "evidence": "irritable"},
+    ],
+}
+
+
+def fake_stream(text: str, size: int):
+    """Split a completion the way a token stream would deliver it."""
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def feed_all(chunks):
+    parser = IncrementalRubricParser()
+    events = []
+    for chunk in chunks:
+        events.extend(parser.feed(chunk))
+    return parser, events
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 10000])
+def test_events_do_not_depend_on_chunking(size):
+    parser, events = feed_all(fake_stream(json.dumps(PAYLOAD), size))
+    assert events == [
+        ("summary", PAYLOAD["summary"]),
+        ("risk", "low"),
+        ("rubric", PAYLOAD["rubrics"][0]),
+        ("rubric", PAYLOAD["rubrics"][1]),
+    ]
+    assert parser.done
+    assert parser.result() == PAYLOAD
+
+
+def test_rubric_is_emitted_when_its_closing_brace_arrives():
+    text = json.dumps(PAYLOAD)
+    cut = text.index("}")  # end of the first rubric
+    parser = IncrementalRubricParser()
+    before = parser.feed(text[:cut])
+    assert [e for e, _ in before] == ["summary", "risk"]
+    assert parser.feed(text[cut]) == [("rubric", PAYLOAD["rubrics"][0])]
+
+
+def test_code_fences_and_chatter_are_ignored():
+    text = "Sure, here it is:\n```json\n%s\n```\nHope that helps {not json}" % json.dumps(PAYLOAD)
+    parser, events = feed_all(fake_stream(text, 5))
+    assert [e for e, _ in events] == ["summary", "risk", "rubric", "rubric"]
+    assert parser.done
+    assert parser.result() == PAYLOAD
+
+
+def test_escaped_quotes_and_braces_inside_strings():
+    payload = {
+        "summary": 'Says "my head {bursts}" \\ [worse] }{',
+        "risk": "medium",
+        "rubrics": [{"path": "Head > Pain > Bursting", "confidence": 0.7, "evidence": 'quote: "}]" ok'}],
+    }
+    for size in (1, 4, 9):
+        parser, events = feed_all(fake_stream(json.dumps(payload), size))
+        assert events == [
+            ("summary", payload["summary"]),
+            ("risk", "medium"),
+            ("rubric", payload["rubrics"][0]),
+        ]
+        assert parser.result() == payload
+
+
+def test_unicode_escapes_split_across_chunks():
+    payload = {"summary": "Kopfschmerz überall", "risk": "low", "rubrics": []}
+    text = json.dumps(payload)  # ensure_ascii: "\\u00fc"
+    parser, events = feed_all(fake_stream(text, 1))
+    assert events[0] == ("summary", payload["summary"])
+
+
+def test_bare_string_rubrics_are_normalized():
+    text = '{"summary": "s", "risk": "low", "rubrics": ["Head > Pain", "Mind > Fear", ""]}'
+    parser, events = feed_all(fake_stream(text, 3))
+    assert [d for e, d in events if e == "rubric"] == [
+        {"path": "Head > Pain", "confidence": None, "evidence": ""},
+        {"path": "Mind > Fear", "confidence": None, "evidence": ""},
+    ]
+    assert parser.result()["rubrics"] == [d for e, d in events if e == "rubric"]
+
+
+def test_nested_objects():
+    payload = {
+        "meta": {"model": "x", "inner": {"rubrics": ["not these"], "summary": "nor this"}},
+        "summary": "real",
+        "risk": "high",
+        "rubrics": [
+            {"path": "Chest > Pain", "confidence": 0.9, "evidence": "e", "source": {"span": [1, 4], "x": {"y": 1}}},
+            {"path": "Fever > Heat", "confidence": 0.5, "evidence": "f"},
+        ],
+    }
+    parser, events = feed_all(fake_stream(json.dumps(payload), 2))
+    assert events == [
+        ("summary", "real"),
+        ("risk", "high"),
+        ("rubric", payload["rubrics"][0]),
+        ("rubric", payload["rubrics"][1]),
+    ]
+    assert parser.result() == payload
+
+
+def test_broken_rubric_is_skipped_not_fatal():
+    text = '{"summary": "s", "risk": "low", "rubrics": [{"path": "A" "b"}, {"path": "Head > Pain"}]}'
+    parser, events = feed_all(fake_stream(text, 4))
+    assert [d for e, d in events if e == "rubric"] == [{"path": "Head > Pain"}]
+
+
+def test_truncated_stream_keeps_what_was_recovered():
+    text = json.dumps(PAYLOAD)
+    cut = text.index("Mind")  # inside the second rubric
+    parser, events = feed_all(fake_stream(text[:cut], 3))
+    assert not parser.done
+    assert [e for e, _ in events] == ["summary", "risk", "rubric"]
+    result = parser.result()
+    assert result["summary"] == PAYLOAD["summary"]
+    assert result["risk"] == "low"
+    assert result["rubrics"] == [PAYLOAD["rubrics"][0]]
+
+
+def test_nothing_after_the_closing_brace_is_parsed():
+    parser, events = feed_all([json.dumps(PAYLOAD), ' {"summary": "again"}'])
+    assert parser.feed('{"risk": "high"}') == []
+    assert [e for e, _ in events].count("summary") == 1
+
+
+def test_sse_event_format():
+    assert sse_event("rubric", {"path": "a"}) == 'event: rubric\ndata: {"path": "a"}\n\n'
@@ -38,3 +38,12 @@ export async function parseText(text: string) {
   const res = await api.post("/ai/parse-text", { text });
   return res.data;
 }
+
+export async function repertorize(
+  rubrics: { rubric_id?: number; path?: string; weight?: number }[],
+  method: "totality" | "weighted" | "count" = "totality",
+  top_k = 10
+) {
+  const res = await api.post("/repertorize", { rubrics, method, top_k });
+  return res.data;
+}